@@ -0,0 +1,210 @@
+"""Synthetic-load benchmark of the prediction and projection pipeline.
+
+Generates IPTU datasets with a realistic (log-normal, heavily repeated)
+distribution of values and times every stage of the "Predições" and
+"Visualização" flows separately, calling the same functions the app does:
+
+    ingest_xlsx        parse the spreadsheet into the columnar cache
+                       (only up to --xlsx-max rows, Excel caps at 1,048,576)
+    ingest_cache_load  memory-map the cached IPTU column
+    model_load         unpickle the model
+    count_classes      pipeline.count_classes: deduplication, breakpoint
+                       table, chunked and parallel classification
+    aggregate          material totals
+    bootstrap          confidence intervals from 2000 replicates
+    estimate           pipeline.estimate end to end, prediction cache cleared
+    result_write       store the result for the session, spilled to disk
+    projection         Visualização unit/period/type grid
+
+Without --model, a stand-in classifier and synthetic class statistics are
+installed in a scratch models directory so estimate() runs unchanged.
+
+Each result is printed as one JSON line. Stages are compared with the limits
+in benchmarks/thresholds.json, either per million households (plus an
+optional fixed base_seconds) or per run;
+with --check the exit status is 1 when any limit is exceeded.
+
+Usage (from the repository root):
+    python benchmarks/pipeline.py [--sizes 10000 100000 1000000 5000000] [--model Classificacao.sav] [--check]
+"""
+import os
+import sys
+import json
+import time
+import pickle
+import argparse
+import tempfile
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sadgrs import ingest, stats, results, bootstrap, resources, breakpoints  # noqa: E402
+from sadgrs.cache import predictions  # noqa: E402
+from sadgrs.models import registry  # noqa: E402
+from sadgrs.projection import projection_grid  # noqa: E402
+from sadgrs.aggregate import MATERIAIS, aggregate  # noqa: E402
+from sadgrs.pipeline import count_classes, estimate  # noqa: E402
+
+THRESHOLDS = os.path.join(ROOT, 'benchmarks', 'thresholds.json')
+SIZES = [10000, 100000, 1000000, 5000000]
+XLSX_MAX = 100000
+
+
+class ThresholdModel:
+    """Stand-in classifier used when no model is given: three IPTU bands."""
+    classes_ = np.array([1, 2, 3])
+
+    def predict(self, X):
+        return np.searchsorted([600.0, 1500.0], np.asarray(X, dtype=float).ravel(), side='right') + 1
+
+
+def synthetic_iptu(n, seed=0):
+    # Few distinct values (~5% of households), log-normal like real IPTU
+    rng = np.random.default_rng(seed)
+    valores = np.round(rng.lognormal(mean=6.7, sigma=0.8, size=max(n // 20, 1)), 2)
+    return rng.choice(valores, size=n).astype(np.float32)
+
+
+def synthetic_stats(n_classes, records=150, seed=0):
+    # A survey of `records` households per class, with a few missing values
+    rng = np.random.default_rng(seed)
+    escala = rng.uniform(10, 400, size=(n_classes, len(MATERIAIS)))
+    rotulos = np.repeat(np.arange(1, n_classes + 1), records)
+    amostras = rng.exponential(escala[rotulos - 1])
+    amostras[rng.random(amostras.shape) < 0.05] = np.nan
+    classes = list(range(1, n_classes + 1))
+    n, media, m2 = stats.moments(amostras, rotulos, classes)
+    return {
+        'classes': classes, 'media': media, 'margem': stats.margin(n, m2),
+        'media_emb': np.tile([0.6, 0.4], (n_classes, 1)),
+        'n': n, 'm2': m2, 'amostras': amostras, 'rotulos': rotulos,
+    }
+
+
+def install_synthetic_model(workdir):
+    """Stand-in model and statistics where the registry and stats will find them."""
+    model_name = 'sintetico.sav'
+    registry.dir_path = os.path.join(workdir, 'models')
+    stats.STATS_DIR = os.path.join(workdir, 'models', 'stats')
+    breakpoints.COMPILED_DIR = os.path.join(workdir, 'models', 'compiled')
+    os.makedirs(registry.dir_path)
+    with open(registry.path(model_name), 'wb') as f:
+        pickle.dump(ThresholdModel(), f)
+    stats.save(model_name, model_sha256=registry.sha256(model_name), **synthetic_stats(3))
+    return model_name
+
+
+def timed(fn, repeat):
+    best, value = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, value
+
+
+def run_size(n, model_name, repeat, xlsx_max, workdir):
+    iptu = synthetic_iptu(n)
+    stages = {}
+
+    if n <= xlsx_max:
+        import pandas as pd
+
+        path = os.path.join(workdir, 'iptu_%d.xlsx' % n)
+        pd.DataFrame({'IPTU': iptu.astype(float)}).to_excel(path, index=False)
+
+        def ingest_xlsx():
+            # A fresh cache every time, so the spreadsheet is really parsed
+            ingest.CACHE_DIR = tempfile.mkdtemp(dir=workdir)
+            resources.cache.invalidate(kind='colunas')
+            ingest._path_digests.clear()
+            return ingest.ingest(path)
+        stages['ingest_xlsx'], _ = timed(ingest_xlsx, repeat)
+
+    digest = 'bench-%d' % n
+    ingest._write(digest, {'IPTU': iptu})
+
+    def cache_load():
+        resources.cache.invalidate(kind='colunas')
+        return np.asarray(ingest.load_column(digest)).sum()
+    stages['ingest_cache_load'], _ = timed(cache_load, repeat)
+    iptu = ingest.load_column(digest)
+
+    def load_model():
+        registry.invalidate(model_name)
+        return registry.load(model_name)
+    stages['model_load'], model = timed(load_model, repeat)
+    estatisticas = stats.load(model_name)
+    classes = estatisticas['classes'].tolist()
+    table = breakpoints.load(model_name)
+
+    stages['count_classes'], qntd_clas = timed(lambda: count_classes(model, iptu, classes, table=table), repeat)
+    stages['aggregate'], resultado = timed(
+        lambda: aggregate(qntd_clas, estatisticas['media'], estatisticas['media_emb']), repeat)
+    stages['bootstrap'], intervalos = timed(lambda: bootstrap.intervals(qntd_clas, estatisticas), repeat)
+    resultado.update(intervalos)
+
+    def run_estimate():
+        predictions.clear()
+        return estimate(model_name, digest)
+    stages['estimate'], _ = timed(run_estimate, repeat)
+
+    # ttl=0 spills on every put, so this times the in-memory store plus the disk round trip
+    store = results.ResultStore(ttl=0, spill_dir=os.path.join(workdir, 'sessions'))
+
+    def write_result():
+        store.put('bench', {'materiais': resultado['superior'], 'qntd_dom': n})
+        return store.get('bench')
+    stages['result_write'], _ = timed(write_result, repeat)
+
+    stages['projection'], _ = timed(lambda: projection_grid(resultado['superior'], n, 3), repeat)
+    return stages
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark do pipeline de predição com dados sintéticos')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--model', help='modelo em ./models/ (padrão: classificador sintético)')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--xlsx-max', type=int, default=XLSX_MAX)
+    parser.add_argument('--thresholds', default=THRESHOLDS)
+    parser.add_argument('--check', action='store_true', help='falha se algum limite for excedido')
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    with open(args.thresholds) as f:
+        thresholds = json.load(f)
+
+    regressions = []
+    with tempfile.TemporaryDirectory() as workdir:
+        ingest.CACHE_DIR = tempfile.mkdtemp(dir=workdir)
+        # Predictions stay in memory only, so estimate() is timed from scratch
+        predictions.persist_dir = None
+        model_name = args.model or install_synthetic_model(workdir)
+        for n in args.sizes:
+            for stage, seconds in run_size(n, model_name, args.repeat, args.xlsx_max, workdir).items():
+                limit = thresholds.get(stage)
+                if limit is None:
+                    ok = True
+                elif limit['per'] == 'million':
+                    # base_seconds covers fixed costs (e.g. the bootstrap) on small files
+                    ok = seconds <= limit.get('base_seconds', 0) + limit['max_seconds'] * n / 1000000
+                else:
+                    ok = seconds <= limit['max_seconds']
+                print(json.dumps({
+                    'stage': stage, 'households': n, 'seconds': round(seconds, 6),
+                    'seconds_per_million': round(seconds * 1000000 / n, 6), 'ok': ok,
+                }))
+                if not ok:
+                    regressions.append((stage, n))
+
+    if args.check and regressions:
+        for stage, n in regressions:
+            print('limite excedido: %s com %d domicílios' % (stage, n), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
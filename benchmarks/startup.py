@@ -0,0 +1,87 @@
+"""Cold-start benchmark for home.py.
+
+Reports, each measured in a fresh interpreter and repeated to take the
+median:
+
+* the import time of every third-party module the app uses;
+* the time to first paint of every page, i.e. from interpreter start to the
+  end of one execution of home.py with that page selected. The script runs in
+  Streamlit's bare mode (no server), with the sidebar menu forced to the page.
+
+Usage (from the repository root):
+    python benchmarks/startup.py [--repeat 5] [--json startup.json]
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = [
+    'streamlit', 'numpy', 'pandas', 'plotly.express', 'PIL.Image', 'fpdf', 'htbuilder',
+    'streamlit_lottie', 'streamlit_option_menu', 'requests', 'sklearn',
+]
+PAGES = ['Início', 'Predições', 'Visualização', 'Modelagem']
+
+IMPORT_SNIPPET = '''
+import time
+t = time.perf_counter()
+import {module}
+print(time.perf_counter() - t)
+'''
+
+PAGE_SNIPPET = '''
+import time
+t = time.perf_counter()
+import runpy
+import streamlit_option_menu
+streamlit_option_menu.option_menu = lambda *args, **kwargs: {page!r}
+runpy.run_path('home.py', run_name='__main__')
+print(time.perf_counter() - t)
+'''
+
+
+def _run(code):
+    out = subprocess.run(
+        [sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    # The timing is the last line; bare mode may print warnings before it
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def _median(code, repeat):
+    return statistics.median(_run(code) for _ in range(repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    report = {'imports': {}, 'pages': {}}
+    for module in MODULES:
+        try:
+            report['imports'][module] = _median(IMPORT_SNIPPET.format(module=module), args.repeat)
+        except subprocess.CalledProcessError:
+            report['imports'][module] = None
+    for page in PAGES:
+        report['pages'][page] = _median(PAGE_SNIPPET.format(page=page), args.repeat)
+
+    print('%-24s %10s' % ('import', 'ms'))
+    for module, seconds in report['imports'].items():
+        print('%-24s %10s' % (module, 'n/a' if seconds is None else '%.1f' % (seconds * 1000)))
+    print()
+    print('%-24s %10s' % ('first paint', 'ms'))
+    for page, seconds in report['pages'].items():
+        print('%-24s %10.1f' % (page, seconds * 1000))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,20 +1,15 @@
-import os
-import time
-import math
-import json
-import pickle
-import base64
-import requests
-import numpy as np
-import pandas as pd
-from PIL import Image
-from fpdf import FPDF
 import streamlit as st
-import plotly.express as px
-from htbuilder.units import rem
 from streamlit_lottie import st_lottie
-from htbuilder import div, big, h2, styles
 from streamlit_option_menu import option_menu
+from sadgrs import assets, dials, metrics, warmup, resources
+from sadgrs.models import registry
+
+# numpy, pandas, plotly and the modules built on them are imported inside the
+# pages that use them, so "Início" and cold starts do not pay for them
+
+# Stage timings of this rerun and of the background job it shows
+tempos = metrics.begin()
+tempos_job = []
 
 COLOR_BLUE = "#1C83E1"
 COLOR_RED = "#dd4f78"
@@ -37,74 +32,24 @@ st.set_page_config(
 #           """
 #st.markdown(hide_st_style, unsafe_allow_html=True)
 
-def load_lottiefile(filepath: str):
-    with open(filepath, "r") as f:
-        return json.load(f)
-
-
-def load_lottieurl(url: str):
-    r = requests.get(url)
-    if r.status_code != 200:
-        return None
-    return r.json()
-
-def display_dial(title, value, color):
-    st.markdown(
-        div(
-            style=styles(
-                text_align="center",
-                color=color,
-                padding=(rem(0.8), 0, rem(3), 0),
-            )
-        )(
-            h2(style=styles(font_size=rem(0.9), font_weight=600, padding=0))(title),
-            big(style=styles(font_size=rem(2.6), font_weight=800, line_height=1))(
-                value
-            ),
-        ),
-        unsafe_allow_html=True,
-    )
-
-def display_interval(title, value, color):
-    st.markdown(
-        div(
-            style=styles(
-                text_align="center",
-                color=color,
-                padding=(rem(0.8), 0, rem(3), 0),
-            )
-        )(
-            h2(style=styles(font_size=rem(0.9), font_weight=600, padding=0))(title),
-            big(style=styles(font_size=rem(2.1), font_weight=800, line_height=1))(
-                value
-            ),
-        ),
-        unsafe_allow_html=True,
-    )
-
-class NpEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, np.integer):
-            return int(obj)
-        if isinstance(obj, np.floating):
-            return float(obj)
-        if isinstance(obj, np.ndarray):
-            return obj.tolist()
-        return json.JSONEncoder.default(self, obj)
-
 # Menu sidebar
 with st.sidebar:
-    lottie_home = load_lottieurl("https://assets4.lottiefiles.com/packages/lf20_D2Bl7ZTvwe.json")
-    st_lottie(
-        lottie_home,
-        speed=1,
-        reverse=False,
-        loop=False,
-        quality="low", # medium ; high
-        height=None,
-        width=None,
-        key=None,
-    )
+    # Never wait on the network: missing animations are fetched in background
+    assets.prefetch(assets.LOTTIE_SIDEBAR, assets.LOTTIE_HOME)
+    lottie_home = assets.load_lottie(assets.LOTTIE_SIDEBAR)
+    if lottie_home is None:
+        st.image('./images/logo_prs.png')
+    else:
+        st_lottie(
+            lottie_home,
+            speed=1,
+            reverse=False,
+            loop=False,
+            quality="low", # medium ; high
+            height=None,
+            width=None,
+            key=None,
+        )
     selected = option_menu(
         menu_title=' ',
         options=["Início", "Predições", "Visualização", "Modelagem"],
@@ -126,6 +71,7 @@ with st.sidebar:
     )
 
     st.markdown("---")
+    diagnostico = st.checkbox("Diagnóstico", help="Exibe o tempo de cada etapa do processamento")
 
 # Page home
 if selected == "Início":
@@ -134,17 +80,20 @@ if selected == "Início":
     left_col, right_col = st.columns(2)
 
     with left_col:
-        lottie_home = load_lottieurl("https://assets2.lottiefiles.com/temp/lf20_3bpCnZ.json")
-        st_lottie(
-            lottie_home,
-            speed=0.6,
-            reverse=False,
-            loop=True,
-            quality="low", # medium ; high
-            height=None,
-            width=400,
-            key=None,
-        )
+        lottie_home = assets.load_lottie(assets.LOTTIE_HOME)
+        if lottie_home is None:
+            st.image('./images/logo_prs.png', width=400)
+        else:
+            st_lottie(
+                lottie_home,
+                speed=0.6,
+                reverse=False,
+                loop=True,
+                quality="low", # medium ; high
+                height=None,
+                width=400,
+                key=None,
+            )
         
 
     # Title and description
@@ -196,11 +145,20 @@ if selected == "Início":
 
     with right_info_col:
         st.write(" ")
-        image = Image.open('./images/projeto_rs.png')
-        st.image(image, caption='Convênio técnico científico MPMS UEMS', width=200, use_column_width='never')
+        st.image('./images/projeto_rs.png', caption='Convênio técnico científico MPMS UEMS', width=200, use_column_width='never')
         
 # Page predictions
 if selected == "Predições":
+    import time
+    import numpy as np
+    import pandas as pd
+    import plotly.express as px
+    from sadgrs import stats, results
+    from sadgrs.jobs import jobs
+    from sadgrs.ingest import source_digest
+    from sadgrs.aggregate import MATERIAIS, ROTULOS
+    from sadgrs.pipeline import estimate_key, estimate_job
+
     mat_color = COLOR_BLUE
     tot_color = COLOR_RED
     int_color = COLOR_BLACK
@@ -215,26 +173,13 @@ if selected == "Predições":
         """
         )
 
-        files_dir = []
-        dir_path = './models/'
-        # Iterate directory
-        for path in os.listdir(dir_path):
-            # check if current path is a file
-            if os.path.isfile(os.path.join(dir_path, path)):
-                files_dir.append(path)
-        print(files_dir)
+        files_dir = registry.list_models()
 
         default_municipio = 'Campo Grande'
 
-        f = open('./data/cidades_ms.json', encoding="utf8") 
-        data = json.load(f)
-        municipios = data['cidades']
-        municipio = st.selectbox("Selecione o município", municipios,index=19)
-        f.close()
+        municipio = st.selectbox("Selecione o município", resources.municipios(), index=19)
 
         selected_model = st.selectbox("Selecione o modelo", list(files_dir), 0)
-        model_path = './models/' + selected_model
-        loaded_model = pickle.load(open(model_path, 'rb'))
 
         st.write(
             """
@@ -249,258 +194,142 @@ if selected == "Predições":
             "Usar relação padrão (Campo Grande)", False, help="Use a planilha com a relação dos domicílios de Campo Grande"
         )
 
-    df = []
+    source = None
     if use_default_iptu:
+        #load data from disk (parsed once, then memory-mapped from the cache)
+        source = './data/IPTU_MEDIO_RESIDENCIAL_CG.xlsx'
+    elif uploaded_file:
+        #load data from de uploaded file
+        source = uploaded_file.getvalue()
+
+    if source is None:
+        # Unticking the default file or removing the upload forgets a cancel
+        st.session_state.pop('job_cancelado', None)
+    else:
         with c2:
             st.markdown("---")
 
-            #load data from disk
-            file_loc = './data/IPTU_MEDIO_RESIDENCIAL_CG.xlsx'
-
-            with st.spinner('Carregando dados...'):
-                df = pd.read_excel(file_loc)
-            st.success('Pronto!')
-            
-        uploaded_file = file_loc
-
-    if uploaded_file:
-        with c2:
-
-            if not use_default_iptu:
-                st.markdown("---")
-
-                with st.spinner('Carregando dados...'):
-                    #load data from de uploaded file
-                    df = pd.read_excel(uploaded_file)
-                st.success('Pronto!')
-
-        iptu = df['IPTU']
-        res_clas = loaded_model.predict(iptu.to_frame())
-        qntd_clas = pd.Series(res_clas).value_counts()
-        qntd_dom = len(iptu)
-
-        if(selected_model == 'Classificacao.sav'):
-            media_classe_1 = pickle.load(open('./data/media_classe_1.sav', 'rb'))
-            media_classe_2 = pickle.load(open('./data/media_classe_2.sav', 'rb'))
-            media_classe_3 = pickle.load(open('./data/media_classe_3.sav', 'rb'))
-            margem_classe_1 = pickle.load(open('./data/margem_classe_1.sav', 'rb'))
-            margem_classe_2 = pickle.load(open('./data/margem_classe_2.sav', 'rb'))
-            margem_classe_3 = pickle.load(open('./data/margem_classe_3.sav', 'rb'))
-            media_p_emb_1 = pickle.load(open('./data/media_emb_1.sav', 'rb'))
-            media_p_emb_2 = pickle.load(open('./data/media_emb_2.sav', 'rb'))
-            media_p_emb_3 = pickle.load(open('./data/media_emb_3.sav', 'rb'))
-            st.write(qntd_clas[1])
-            st.write(qntd_clas[2])
-
-            if(len(qntd_clas) == 1):
-                total_classe_1 = media_classe_1 * qntd_clas[1]
-                perc_marg_1 = margem_classe_1 / media_classe_1
-                margemxpeso_1 = perc_marg_1 * qntd_clas[1]
-                soma_mxp = margemxpeso_1
-                soma_p = qntd_clas[1]
-                saida = total_classe_1
-                media_classes = media_classe_1
-                media_p_emb = media_p_emb_1
-            elif (len(qntd_clas) == 2):
-                total_classe_1 = media_classe_1 * qntd_clas[1]
-                total_classe_2 = media_classe_2 * qntd_clas[2]
-                perc_marg_1 = margem_classe_1 / media_classe_1
-                perc_marg_2 = margem_classe_2 / media_classe_2
-                margemxpeso_1 = perc_marg_1 * qntd_clas[1]
-                margemxpeso_2 = perc_marg_2 * qntd_clas[2]
-                soma_mxp = margemxpeso_1 + margemxpeso_2
-                soma_p = qntd_clas[1] + qntd_clas[2]
-                saida = total_classe_1 + total_classe_2
-                media_classes = media_classe_1 + media_classe_2 / 2
-                media_p_emb = media_p_emb_1 + media_p_emb_2 / 2
-            else:
-                total_classe_1 = media_classe_1 * qntd_clas[1]
-                total_classe_2 = media_classe_2 * qntd_clas[2]
-                total_classe_3 = media_classe_3 * qntd_clas[3]
-                perc_marg_1 = margem_classe_1 / media_classe_1
-                perc_marg_2 = margem_classe_2 / media_classe_2
-                perc_marg_3 = margem_classe_3 / media_classe_3
-                margemxpeso_1 = perc_marg_1 * qntd_clas[1]
-                margemxpeso_2 = perc_marg_2 * qntd_clas[2]
-                margemxpeso_3 = perc_marg_3 * qntd_clas[3]
-                soma_mxp = margemxpeso_1 + margemxpeso_2 + margemxpeso_3
-                soma_p = qntd_clas[1] + qntd_clas[2] + qntd_clas[3]
-                saida = total_classe_1 + total_classe_2 + total_classe_3
-                media_classes = media_classe_1 + media_classe_2 + media_classe_3 / 3
-                media_p_emb = media_p_emb_1 + media_p_emb_2 + media_p_emb_3 / 3
-            
-            media_p = soma_mxp / soma_p
-            margem_err = media_p * saida
-        else:
+        estatisticas = stats.load(selected_model)
+        if estatisticas is None and selected_model == 'Classificacao.sav':
+            # First run after the upgrade: consolidate the legacy per-class pickles
+            stats.convert_legacy(selected_model, model_sha256=registry.sha256(selected_model))
+            estatisticas = stats.load(selected_model)
+        if estatisticas is None:
             st.write(" Ainda estamos trabalhando nisso...")
-
-        plastico_g = saida['Plástico']
-        papel_g = saida['Papel e Papelão']
-        vidro_g = saida['Vidro']
-        metais_g = saida['Metais']
-        emb_m_g = saida['Emb. Mult.']
-        tex_g = saida['Tex. Cour. Bor.']
-        mat_g = saida['Mat. Org.']
-        rej_g = saida['Rejeitos']
-
-        plastico = round(saida['Plástico'].astype(float) / 1000000, 2)
-        papel = round(saida['Papel e Papelão'].astype(float) / 1000000, 2)
-        vidro = round(saida['Vidro'].astype(float) / 1000000, 2)
-        metais = round(saida['Metais'].astype(float) / 1000000, 2)
-        emb_m = round(saida['Emb. Mult.'].astype(float) / 1000000, 2)
-        tex = round(saida['Tex. Cour. Bor.'].astype(float) / 1000000, 2)
-        mat = round(saida['Mat. Org.'].astype(float) / 1000000, 2)
-        rej = round(saida['Rejeitos'].astype(float) / 1000000, 2)
-
-        total = plastico_g + papel_g + vidro_g + metais_g + emb_m_g + tex_g + mat_g + rej_g
-        total_rec = plastico_g + papel_g + vidro_g + metais_g + emb_m_g + tex_g
-        total_n_rec = mat_g + rej_g
-        proporcao = saida / total[0]
-        total_ton = round(total.astype(float) / 1000000, 2)
-        total_text = str(total_ton[0]).replace('.', ',') + "t"
-
-        m_plast_sup = round(margem_err['Plástico'][0].astype(float) / 1000000+plastico[0],2)
-        m_papel_sup = round(margem_err['Papel e Papelão'][0].astype(float) / 1000000+papel[0],2)
-        m_vidro_sup = round(margem_err['Vidro'][0].astype(float) / 1000000+vidro[0],2)
-        m_met_sup = round(margem_err['Metais'][0].astype(float) / 1000000+metais[0],2)
-        m_emb_sup = round(margem_err['Emb. Mult.'][0].astype(float) / 1000000+emb_m[0],2)
-        m_tex_sup = round(margem_err['Tex. Cour. Bor.'][0].astype(float) / 1000000+tex[0],2)
-        m_mat_sup = round(margem_err['Mat. Org.'][0].astype(float) / 1000000+mat[0],2)
-        m_rej_sup = round(margem_err['Rejeitos'][0].astype(float) / 1000000+rej[0],2)
-        if math.isnan(m_tex_sup):
-            sum_sup = m_plast_sup + m_papel_sup + m_vidro_sup + m_met_sup + m_emb_sup + m_mat_sup + m_rej_sup
-        else:
-            sum_sup = m_plast_sup + m_papel_sup + m_vidro_sup + m_met_sup + m_emb_sup + m_tex_sup + m_mat_sup + m_rej_sup
-
-        m_plast_inf = round(plastico[0]-margem_err['Plástico'][0].astype(float) / 1000000, 2)
-        m_papel_inf = round(papel[0]-margem_err['Papel e Papelão'][0].astype(float) / 1000000, 2)
-        m_vidro_inf = round(vidro[0]-margem_err['Vidro'][0].astype(float) / 1000000, 2)
-        m_met_inf = round(metais[0]-margem_err['Metais'][0].astype(float) / 1000000, 2)
-        m_emb_inf = round(emb_m[0]-margem_err['Emb. Mult.'][0].astype(float) / 1000000, 2)
-        m_tex_inf = round(tex[0]-margem_err['Tex. Cour. Bor.'][0].astype(float) / 1000000, 2)
-        m_mat_inf = round(mat[0]-margem_err['Mat. Org.'][0].astype(float) / 1000000, 2)
-        m_rej_inf = round(rej[0]-margem_err['Rejeitos'][0].astype(float) / 1000000, 2)
-        if math.isnan(m_tex_inf):
-            sum_inf = m_plast_inf + m_papel_inf + m_vidro_inf + m_met_inf + m_emb_inf + m_mat_inf + m_rej_inf
-        else:
-            sum_inf = m_plast_inf + m_papel_inf + m_vidro_inf + m_met_inf + m_emb_inf + m_tex_inf + m_mat_inf + m_rej_inf
-
-        c1, c2, c3 = st.columns(3)
-        with c1:
-            for i in range(1,15):
-                st.write(" ")
-            display_dial("Intervalo de confiança inferior", round(sum_inf,2), mat_color)
+            st.stop()
+        if estatisticas['meta']['modelo_sha256'] not in (None, registry.sha256(selected_model)):
+            st.warning("As estatísticas das classes foram geradas para outra versão do modelo.")
+
+        # Reading, classifying and aggregating run in background and survive
+        # reruns; sessions sending the same file share the same job
+        session_id = results.current_session_id()
+        key = estimate_key(selected_model, source_digest(source))
+        cancelado = st.session_state.get('job_cancelado')
+        if cancelado not in (None, key):
+            # Inputs changed since the cancel
+            del st.session_state['job_cancelado']
+        elif cancelado == key:
+            c2.info("Predição cancelada.")
+            if c2.button('Tentar novamente'):
+                del st.session_state['job_cancelado']
+                st.experimental_rerun()
+            st.stop()
+        previous = st.session_state.get('job_predicao')
+        if previous not in (None, key):
+            jobs.cancel(previous, owner=session_id)
+        st.session_state['job_predicao'] = key
+        job = jobs.submit(key, estimate_job, selected_model, source, owner=session_id)
+
+        if not job.wait(timeout=0.5):
+            with c2:
+                st.progress(job.progress, text=job.message or 'Carregando dados...')
+                if st.button('Cancelar'):
+                    jobs.cancel(key, owner=session_id)
+                    st.session_state['job_cancelado'] = key
+                    st.experimental_rerun()
+            time.sleep(0.5)
+            st.experimental_rerun()
 
         with c2:
-            tot_domicilio = f'{len(df):,}'.replace(',', '.')
-            st.write("## ", municipio)
-            display_dial("Total de domicílios ", tot_domicilio, mat_color)
-            display_dial("Geração Domiciliar (Total por dia)", total_text, mat_color)
-
-        with c3:
-            for i in range(1,15):
-                st.write(" ")
-            display_dial("Intervalo de confiança superior", round(sum_sup,2), tot_color)
-
-        c1, c2 = st.columns(2)
-        with c1:
-            st.markdown("<h3 style='text-align: center;'>Geração de materiais</h3>", unsafe_allow_html=True)
-            st.markdown("<h5 style='text-align: center;'>Valor estimado</h5>", unsafe_allow_html=True)
-            st.write(" ")
-            st.write(" ")
-
-            display_dial("PLÁSTICO", str(plastico[0]).replace('.', ',') + "t", mat_color)
-            display_dial("PAPEL E PAPELÃO", str(papel[0]).replace('.', ',') + "t", mat_color)
-            display_dial("VIDRO", str(vidro[0]).replace('.', ',') + "t", mat_color)
-            display_dial("METAIS", str(metais[0]).replace('.', ',') + "t", mat_color)
-            display_dial("EMB. MULTICAMADAS", str(emb_m[0]).replace('.', ',') + "t", mat_color)
-            display_dial("TEX. COUR. BOR.", str(tex[0]).replace('.', ',') + "t", mat_color)
-            display_dial("MAT. ORGANICA", str(mat[0]).replace('.', ',') + "t", mat_color)
-            display_dial("REJEITOS", str(rej[0]).replace('.', ',') + "t", mat_color)
+            try:
+                resultado = job.result()
+            except Exception as e:
+                st.error("Não foi possível realizar a predição: %s" % e)
+                st.stop()
+            st.success('Pronto!')
+        tempos_job = job.timings
+
+        qntd_clas = resultado['qntd_clas']
+        qntd_dom = resultado['qntd_dom']
+
+        # Values per material (g/day), then in tonnes
+        saida = resultado['totais']
+        saida_t = np.round(saida / 1000000, 2)
+        total = np.nansum(saida)
+        proporcao = saida / total
+        total_ton = round(total / 1000000, 2)
+        total_text = str(total_ton).replace('.', ',') + "t"
+
+        # 95% bootstrap intervals (see sadgrs.bootstrap)
+        sup_t = np.round(resultado['superior'] / 1000000, 2)
+        inf_t = np.round(resultado['inferior'] / 1000000, 2)
+        sum_sup = resultado['total_superior'] / 1000000
+        sum_inf = resultado['total_inferior'] / 1000000
+
+        # Every dial of the page goes to the browser as a single element
+        tot_domicilio = f'{qntd_dom:,}'.replace(',', '.')
+        resumo = dials.grid(
+            [dials.dial("Intervalo de confiança inferior", round(sum_inf,2), mat_color)],
+            [
+                dials.heading(municipio),
+                dials.dial("Total de domicílios ", tot_domicilio, mat_color),
+                dials.dial("Geração Domiciliar (Total por dia)", total_text, mat_color),
+            ],
+            [dials.dial("Intervalo de confiança superior", round(sum_sup,2), tot_color)],
+        )
+        por_material = dials.grid(
+            [dials.heading("Geração de materiais", "Valor estimado")] + [
+                dials.dial(rotulo, str(valor).replace('.', ',') + "t", mat_color)
+                for rotulo, valor in zip(ROTULOS, saida_t)
+            ],
+            [dials.heading("Intervalos de confiança", "Estatística")] + [
+                dials.dial(rotulo, str(inf).replace('.', ',') + ' — ' + str(sup).replace('.', ',') + " t", int_color)
+                for rotulo, inf, sup in zip(ROTULOS, inf_t, sup_t)
+            ],
+            align="start",
+        )
+        st.markdown(dials.render(resumo, por_material), unsafe_allow_html=True)
 
-        with c2:
-            st.markdown("<h3 style='text-align: center;'>Intervalos de confiança</h3>", unsafe_allow_html=True)
-            st.markdown("<h5 style='text-align: center;'>Estatística</h5>", unsafe_allow_html=True)
-            st.write(" ")
-            st.write(" ")
-
-            display_dial("PLÁSTICO", str(m_plast_inf).replace('.', ',') + ' — ' + str(m_plast_sup).replace('.', ',') + " t", int_color)
-            display_dial("PAPEL E PAPELÃO", str(m_papel_inf).replace('.', ',') + ' — ' + str(m_papel_sup).replace('.', ',') + " t", int_color)
-            display_dial("VIDRO", str(m_vidro_inf).replace('.', ',') + ' — ' + str(m_vidro_sup).replace('.', ',') + " t", int_color)
-            display_dial("METAIS", str(m_met_inf).replace('.', ',') + ' — ' + str(m_met_sup).replace('.', ',') + " t", int_color)
-            display_dial("EMB. MULTICAMADAS", str(m_emb_inf).replace('.', ',') + ' — ' + str(m_emb_sup).replace('.', ',') + " t", int_color)
-            display_dial("TEX. COUR. BOR.", str(m_tex_inf).replace('.', ',') + ' — ' + str(m_tex_sup).replace('.', ',') + " t", int_color)
-            display_dial("MAT. ORGANICA", str(m_mat_inf).replace('.', ',') + ' — ' + str(m_mat_sup).replace('.', ',') + " t", int_color)
-            display_dial("REJEITOS", str(m_rej_inf).replace('.', ',') + ' — ' + str(m_rej_sup).replace('.', ',') + " t", int_color)
-
-        names = ['Plástico','Papel e Papelão','Vidro','Metais','Emb. Mult.','Tex. Cour. Bor.','Mat. Org.','Rejeitos']
-        df_prop = proporcao.transpose().reset_index(drop=True)
-        df_prop = df_prop.rename(columns={0: 'Proporcao'})
-        df_pie = pd.concat([df_prop, pd.DataFrame(names)], axis=1)
-        df_pie = df_pie.rename(columns={0: 'Material'})
-        
-        fig = px.pie(df_pie, values=df_pie['Proporcao'], names=df_pie['Material'], title='Proporção dos resíduos sólidos')
-        
         c1, c2, c3 = st.columns([1,2,1]) 
-        with c2:
+        with metrics.timer('plotly'), c2:
+            df_pie = pd.DataFrame({'Proporcao': proporcao, 'Material': MATERIAIS})
+            fig = px.pie(df_pie, values=df_pie['Proporcao'], names=df_pie['Material'], title='Proporção dos resíduos sólidos')
             st.write(fig)
 
-        m_plast_sup_g = margem_err['Plástico'][0] +plastico_g[0]
-        m_papel_sup_g = margem_err['Papel e Papelão'][0] +papel_g[0]
-        m_vidro_sup_g = margem_err['Vidro'][0] +vidro_g[0]
-        m_met_sup_g = margem_err['Metais'][0] +metais_g[0]
-        m_emb_sup_g = margem_err['Emb. Mult.'][0] +emb_m_g[0]
-        m_tex_sup_g = margem_err['Tex. Cour. Bor.'][0] +tex_g[0]
-        m_mat_sup_g = margem_err['Mat. Org.'][0] +mat_g[0]
-        m_rej_sup_g = margem_err['Rejeitos'][0] +rej_g[0]
-        sum_sup_g_n_rec = m_mat_sup_g + m_rej_sup_g
-
-        if math.isnan(m_tex_sup):
-            sum_sup_g = m_plast_sup_g + m_papel_sup_g + m_vidro_sup_g + m_met_sup_g + m_emb_sup_g + m_mat_sup_g + m_rej_sup_g
-            sum_sup_g_rec = m_plast_sup_g + m_papel_sup_g + m_vidro_sup_g + m_met_sup_g + m_emb_sup_g
-        else:
-            sum_sup_g = m_plast_sup_g + m_papel_sup_g + m_vidro_sup_g + m_met_sup_g + m_emb_sup_g + m_tex_sup_g + m_mat_sup_g + m_rej_sup_g
-            sum_sup_g_rec = m_plast_sup_g + m_papel_sup_g + m_vidro_sup_g + m_met_sup_g + m_emb_sup_g + m_tex_sup_g
-
-        dictionary = {
-            "plastico": m_plast_sup_g,
-            "papel": m_papel_sup_g,
-            "vidro": m_vidro_sup_g,
-            "metais": m_met_sup_g,
-            "emb_m": m_emb_sup_g,
-            "tex": m_tex_sup_g,
-            "mat": m_mat_sup_g,
-            "rej": m_rej_sup_g,
-            "total": sum_sup_g,
-            "total_rec": sum_sup_g_rec,
-            "total_n_rec": sum_sup_g_n_rec,
-            "qntd_clas_1": qntd_clas[1],
-            "qntd_clas_2": qntd_clas[2],
+        # Kept in memory for this session only; read back by "Visualização"
+        results.store.put(results.current_session_id(), {
+            "materiais": resultado['superior'],
+            "qntd_clas": qntd_clas,
             "qntd_dom": qntd_dom,
-            "media_plast": media_classes['Plástico'][0],
-            "media_papel": media_classes['Papel e Papelão'][0],
-            "media_vid": media_classes['Vidro'][0],
-            "media_met": media_classes['Metais'][0],
-            "media_emb": media_classes['Emb. Mult.'][0],
-            "media_tex": media_classes['Tex. Cour. Bor.'][0],
-            "media_mat": media_classes['Mat. Org.'][0],
-            "media_rej": media_classes['Rejeitos'][0],
-            "media_p_emb": media_p_emb['P_Emb'][0],
-            "media_p_n_emb": media_p_emb['P_N_Emb'][0]
-        }
-
-        arquivo = json.dumps(dictionary, cls=NpEncoder)
-        with open("./data/result.json", "w") as outfile:
-            outfile.write(arquivo)
+            "media_classes": resultado['media_classes'],
+            "media_p_emb": resultado['media_p_emb'],
+        })
 
         with c2:
             st.info("No menu **Visualização**, você terá acesso à mais opções.", icon='ℹ️')
 
 # Page visualization
 if selected == "Visualização":
+    import pandas as pd
+    import plotly.express as px
+    from sadgrs import results
+    from sadgrs.aggregate import MATERIAIS, ROTULOS, CORES
+    from sadgrs.projection import TIPOS, TEMPOS, MEDIDAS, UNIDADES, GRUPOS, FATIAS, PESSOAS, DENSIDADES
+    from sadgrs.projection import projection_grid, sweep, density_index
+
     # Verify if the results exists
-    files = os.listdir('./data/')
-    is_there = "result.json" in files
+    resultado = results.store.get(results.current_session_id())
+    is_there = resultado is not None
 
     a, b, c= st.columns([1, 2, 1])
 
@@ -511,9 +340,9 @@ if selected == "Visualização":
     """
     )
 
-    medida = ['Tonelada (t)', 'Quilograma (kg)', 'Grama (g)']
-    tempo = ['Dia', 'Mês', 'Ano']
-    tipo = ['Domiciliar', 'Por pessoa']
+    medida = MEDIDAS
+    tempo = TEMPOS
+    tipo = TIPOS
     
     a, b, c, d = st.columns([1, 1, 1, 1])
     medida_proj = b.selectbox("Selecione a unidade de medida:", medida)
@@ -526,7 +355,7 @@ if selected == "Visualização":
 
     material_tipo = c.radio(
         "Material:",
-        ('Recicláveis', 'Não-recicláveis', 'Total (Não-recicláveis + recicláveis)'))
+        GRUPOS)
 
     c.write(" ")
 
@@ -539,6 +368,8 @@ if selected == "Visualização":
 
     comp_emb = b.checkbox('Exibir a proporção de embalagens e não embalagens')
 
+    varredura = b.checkbox('Explorar densidade × pessoas por domicílio', help="Mostra todas as combinações de uma vez")
+
     gerar = b.button('Gerar projeções')
 
     if gerar:
@@ -547,349 +378,71 @@ if selected == "Visualização":
 
             st.markdown("<h3 style='text-align: center;'>Projeções sobre gestão de resíduos sólidos </h3>", unsafe_allow_html=True)
             
-            with open('./data/result.json', 'r') as openfile:
-                # Reading from json file
-                arquivo = json.load(openfile)
-            plastico = arquivo["plastico"]
-            papel = arquivo["papel"]
-            vidro = arquivo["vidro"]
-            metais = arquivo["metais"]
-            emb_m = arquivo["emb_m"]
-            tex = arquivo["tex"]
-            mat = arquivo["mat"]
-            rej = arquivo["rej"]
-            total = arquivo["total"]
-            total_rec = arquivo["total_rec"]
-            total_n_rec = arquivo["total_n_rec"]
-            qntd_clas_1 = arquivo["qntd_clas_1"]
-            qntd_clas_2 = arquivo["qntd_clas_2"]
-            qntd_dom = arquivo["qntd_dom"]
-            media_plast = arquivo["media_plast"]
-            media_papel = arquivo["media_papel"]
-            media_vid = arquivo["media_vid"]
-            media_met = arquivo["media_met"]
-            media_emb = arquivo["media_emb"]
-            media_tex = arquivo["media_tex"]
-            media_mat = arquivo["media_mat"]
-            media_rej = arquivo["media_rej"]
-            media_p_emb = arquivo["media_p_emb"]
-            media_p_n_emb = arquivo["media_p_n_emb"]
-
-            names = ['Plástico','Papel e Papelão','Vidro','Metais','Emb. Mult.','Tex. Cour. Bor.','Mat. Org.','Rejeitos']
-            materiais = [plastico, papel, vidro, metais, emb_m, tex, mat, rej]
-            media_classes = [media_plast, media_papel, media_vid, media_met, media_emb, media_tex, media_mat, media_rej]
-            media_p_emb = [media_p_emb, media_p_n_emb]
+            materiais_dia = resultado['materiais']
+            qntd_dom = int(resultado['qntd_dom'])
+            media_p_emb = resultado['media_p_emb'].tolist()
             mat_color = COLOR_BLUE
             tot_color = COLOR_RED
 
-            c1, c2, c3 = st.columns(3)
-            
-            # Material
-            if material_tipo == "Recicláveis":
-                materiais = [materiais[0], materiais[1], materiais[2], materiais[3], materiais[4], materiais[5]]
-                media_classes = [media_classes[0],media_classes[1],media_classes[2],media_classes[3],media_classes[4],media_classes[5]]
-                names = ['Plástico','Papel e Papelão','Vidro','Metais','Emb. Mult.','Tex. Cour. Bor.']
+            # The whole unit/period/type grid is computed once per result and household size
+            if tipo_proj != 'Por pessoa':
+                media_pessoa = 3
+            chave = (materiais_dia.tobytes(), qntd_dom, media_pessoa)
+            if st.session_state.get('projecoes_chave') != chave:
+                st.session_state['projecoes'] = projection_grid(materiais_dia, qntd_dom, media_pessoa)
+                st.session_state['projecoes_chave'] = chave
+            projecoes = st.session_state['projecoes']
+            # Density and household size surfaces, looked up by the sliders
+            if st.session_state.get('superficie_chave') != chave[:2]:
+                st.session_state['superficie'] = sweep(materiais_dia, qntd_dom)
+                st.session_state['superficie_chave'] = chave[:2]
+            superficie = st.session_state['superficie']
+
+            i_tipo = TIPOS.index(tipo_proj)
+            i_tempo = TEMPOS.index(tempo_proj)
+            i_medida = MEDIDAS.index(medida_proj)
+            i_grupo = GRUPOS.index(material_tipo)
+            fatia = FATIAS[i_grupo]
+            unidade = UNIDADES[i_medida]
+
+            materiais = projecoes['materiais'][i_tipo, i_tempo, i_medida, fatia]
+            total_v = projecoes['totais'][i_tipo, i_tempo, i_medida, i_grupo]
+            names = MATERIAIS[fatia]
+
+            def formatar(valor):
+                # Per person values in tonnes are too small for two decimals
+                if unidade == 't' and tipo_proj == 'Por pessoa':
+                    return f'{valor:.6f}'.replace('.', ',') + unidade
+                return str(round(valor, 2)).replace('.', ',') + unidade
 
-                ###
-                if tipo_proj == 'Por pessoa':
-                    var_res = []
-                    var_total_rec = 0
-                    for material in materiais:
-                        var_res.append((material / qntd_dom)/media_pessoa)
-                        var_total_rec += (material / qntd_dom)/media_pessoa
-                    materiais = var_res
-                    total_rec = var_total_rec
-
-                if tempo_proj == 'Mês':
-                    var_res = []
-                    for material in materiais:
-                        var_res.append(material * 30)
-                    materiais = var_res
-                    total_rec = total_rec * 30
-                elif tempo_proj == 'Ano':
-                    var_res = []
-                    for material in materiais:
-                        var_res.append(material * 365)
-                    materiais = var_res
-                    total_rec = total_rec * 365
-                else: # Dia
-                    st.write('')
-
-                total_v = total_rec
-
-                # Medidas
-                if medida_proj == "Tonelada (t)":
-                    var_res = []
-                    for material in materiais:
-                        var_res.append(material / 1000000)
-                    materiais = var_res
-                    total_v = total_v / 1000000
-                    st.write(" ")
-                    
-                    if tipo_proj == 'Por pessoa':
-                        with c1:
-                            display_dial("PLÁSTICO", str(f'{materiais[0]:.6f}').replace('.', ',') + "t", mat_color)
-                            display_dial("PAPEL E PAPELÃO", str(f'{materiais[1]:.6f}').replace('.', ',') + "t", mat_color)
-                            display_dial("VIDRO", str(f'{materiais[2]:.6f}').replace('.', ',') + "t", mat_color)
-                            display_dial("METAIS", str(f'{materiais[3]:.6f}').replace('.', ',') + "t", mat_color)
-                            display_dial("EMB. MULTICAMADAS", str(f'{materiais[4]:.6f}').replace('.', ',') + "t", mat_color)
-                            display_dial("TEX. COUR. BOR.", str(f'{materiais[5]:.6f}').replace('.', ',') + "t", mat_color)
-                            st.write(" ")
-                            st.write(" ")
-                            display_dial("TOTAL", str(f'{total_v:.6f}').replace('.', ',') + "t", tot_color)
-                    else:
-                        with c1:
-                            display_dial("PLÁSTICO", str(round(materiais[0],2)).replace('.', ',') + "t", mat_color)
-                            display_dial("PAPEL E PAPELÃO", str(round(materiais[1],2)).replace('.', ',') + "t", mat_color)
-                            display_dial("VIDRO", str(round(materiais[2],2)).replace('.', ',') + "t", mat_color)
-                            display_dial("METAIS", str(round(materiais[3],2)).replace('.', ',') + "t", mat_color)
-                            display_dial("EMB. MULTICAMADAS", str(round(materiais[4],2)).replace('.', ',') + "t", mat_color)
-                            display_dial("TEX. COUR. BOR.", str(round(materiais[5],2)).replace('.', ',') + "t", mat_color)
-                            st.write(" ")
-                            st.write(" ")
-                            display_dial("TOTAL", str(round(total_v,2)).replace('.', ',') + "t", tot_color)
-
-                elif medida_proj == 'Quilograma (kg)':
-                    var_res = []
-                    for material in materiais:
-                        var_res.append(material / 1000)
-                    materiais = var_res
-                    total_v = total_v / 1000
-                    st.write(" ")
-                    
-                    with c1:
-                        display_dial("PLÁSTICO", str(round(materiais[0],2)).replace('.', ',') + "kg", mat_color)
-                        display_dial("PAPEL E PAPELÃO", str(round(materiais[1],2)).replace('.', ',') + "kg", mat_color)
-                        display_dial("VIDRO", str(round(materiais[2],2)).replace('.', ',') + "kg", mat_color)
-                        display_dial("METAIS", str(round(materiais[3],2)).replace('.', ',') + "kg", mat_color)
-                        display_dial("EMB. MULTICAMADAS", str(round(materiais[4],2)).replace('.', ',') + "kg", mat_color)
-                        display_dial("TEX. COUR. BOR.", str(round(materiais[5],2)).replace('.', ',') + "kg", mat_color)
-                        st.write(" ")
-                        st.write(" ")
-                        display_dial("TOTAL", str(round(total_v,2)).replace('.', ',') + "kg", tot_color)
-
-                else: # medida == Grama (g)
-                    st.write(" ")
-                    with c1:
-                        display_dial("PLÁSTICO", str(round(materiais[0],2)).replace('.', ',') + "g", mat_color)
-                        display_dial("PAPEL E PAPELÃO", str(round(materiais[1],2)).replace('.', ',') + "g", mat_color)
-                        display_dial("VIDRO", str(round(materiais[2],2)).replace('.', ',') + "g", mat_color)
-                        display_dial("METAIS", str(round(materiais[3],2)).replace('.', ',') + "g", mat_color)
-                        display_dial("EMB. MULTICAMADAS", str(round(materiais[4],2)).replace('.', ',') + "g", mat_color)
-                        display_dial("TEX. COUR. BOR.", str(round(materiais[5],2)).replace('.', ',') + "g", mat_color)
-                        st.write(" ")
-                        st.write(" ")
-                        display_dial("TOTAL", str(round(total_v,2)).replace('.', ',') + "g", tot_color)
-
-            elif material_tipo == "Não-recicláveis":
-                materiais = [materiais[6], materiais[7]]
-                media_classes = [media_classes[6],media_classes[7]]
-                names = ['Mat. Org.','Rejeitos']
-
-                if tipo_proj == 'Por pessoa':
-                    var_res = []
-                    var_total_n_rec = 0
-                    for material in materiais:
-                        var_res.append((material / qntd_dom)/media_pessoa)
-                        var_total_n_rec += (material / qntd_dom)/media_pessoa
-                    materiais = var_res
-                    total_n_rec = var_total_n_rec
-
-                if tempo_proj == 'Mês':
-                    var_res = []
-                    for material in materiais:
-                        var_res.append(material * 30)
-                    materiais = var_res
-                    total_n_rec = total_n_rec * 30
-                elif tempo_proj == 'Ano':
-                    var_res = []
-                    for material in materiais:
-                        var_res.append(material * 365)
-                    materiais = var_res
-                    total_n_rec = total_n_rec * 365
-                else: # Dia
-                    st.write('')
-
-                total_v = total_n_rec
-
-                # Medidas
-                if medida_proj == "Tonelada (t)":
-                    var_res = []
-                    for material in materiais:
-                        var_res.append(material / 1000000)
-                    materiais = var_res
-                    total_v = total_v / 1000000
-                    st.write(" ")
-
-                    if tipo_proj == 'Por pessoa':
-                        with c1:
-                            display_dial("MAT. ORGANICA", str(f'{materiais[0]:.6f}').replace('.', ',') + "t", mat_color)
-                            display_dial("REJEITOS", str(f'{materiais[1]:.6f}').replace('.', ',') + "t", mat_color)
-                            st.write(" ")
-                            st.write(" ")
-                            display_dial("TOTAL", str(f'{total_v:.6f}').replace('.', ',') + "t", tot_color)
-                    else:
-                        with c1:
-                            display_dial("MAT. ORGANICA", str(round(materiais[0],2)).replace('.', ',') + "t", mat_color)
-                            display_dial("REJEITOS", str(round(materiais[1],2)).replace('.', ',') + "t", mat_color)
-                            st.write(" ")
-                            st.write(" ")
-                            display_dial("TOTAL", str(round(total_v,2)).replace('.', ',') + "t", tot_color)
-
-                elif medida_proj == 'Quilograma (kg)':
-                    var_res = []
-                    for material in materiais:
-                        var_res.append(material / 1000)
-                    materiais = var_res
-                    total_v = total_v / 1000
-
-                    with c1:
-                        display_dial("MAT. ORGANICA", str(round(materiais[0],2)).replace('.', ',') + "kg", mat_color)
-                        display_dial("REJEITOS", str(round(materiais[1],2)).replace('.', ',') + "kg", mat_color)
-                        st.write(" ")
-                        st.write(" ")
-                        display_dial("TOTAL", str(round(total_v,2)).replace('.', ',') + "kg", tot_color)
-
-                else: # medida == Grama (g)
-                    with c1:
-                        display_dial("MAT. ORGANICA", str(round(materiais[0],2)).replace('.', ',') + "g", mat_color)
-                        display_dial("REJEITOS", str(round(materiais[1],2)).replace('.', ',') + "g", mat_color)
-                        st.write(" ")
-                        st.write(" ")
-                        display_dial("TOTAL", str(round(total_v,2)).replace('.', ',') + "g", tot_color)
-
-            else:
-                ###
-                ###
-                if tipo_proj == 'Por pessoa':
-                    var_res = []
-                    var_total = 0
-                    for material in materiais:
-                        var_res.append((material / qntd_dom)/media_pessoa)
-                        var_total += (material / qntd_dom)/media_pessoa
-                    materiais = var_res
-                    total = var_total
-
-                if tempo_proj == 'Mês':
-                    var_res = []
-                    for material in materiais:
-                        var_res.append(material * 30)
-                    materiais = var_res
-                    total = total * 30
-                elif tempo_proj == 'Ano':
-                    var_res = []
-                    for material in materiais:
-                        var_res.append(material * 365)
-                    materiais = var_res
-                    total = total * 365
-                else: # Dia
-                    st.write('')
-
-                total_v = total
-
-                # Medidas
-                if medida_proj == "Tonelada (t)":
-                    var_res = []
-                    for material in materiais:
-                        var_res.append(material / 1000000)
-                    materiais = var_res
-                    total_v = total_v / 1000000
-                    st.write(" ")
-
-                    if tipo_proj == 'Por pessoa':
-                        with c1:
-                            display_dial("PLÁSTICO", str(f'{materiais[0]:.6f}').replace('.', ',') + "t", mat_color)
-                            display_dial("PAPEL E PAPELÃO", str(f'{materiais[1]:.6f}').replace('.', ',') + "t", mat_color)
-                            display_dial("VIDRO", str(f'{materiais[2]:.6f}').replace('.', ',') + "t", mat_color)
-                            display_dial("METAIS", str(f'{materiais[3]:.6f}').replace('.', ',') + "t", mat_color)
-                            display_dial("EMB. MULTICAMADAS", str(f'{materiais[4]:.6f}').replace('.', ',') + "t", mat_color)
-                            display_dial("TEX. COUR. BOR.", str(f'{materiais[5]:.6f}').replace('.', ',') + "t", mat_color)
-                            display_dial("MAT. ORGANICA", str(f'{materiais[6]:.6f}').replace('.', ',') + "t", mat_color)
-                            display_dial("REJEITOS", str(f'{materiais[7]:.6f}').replace('.', ',') + "t", mat_color)
-                            st.write(" ")
-                            st.write(" ")
-                            display_dial("TOTAL", str(f'{total_v:.6f}').replace('.', ',') + "t", tot_color)
-                    else:
-                        with c1:
-                            display_dial("PLÁSTICO", str(round(materiais[0],2)).replace('.', ',') + "t", mat_color)
-                            display_dial("PAPEL E PAPELÃO", str(round(materiais[1],2)).replace('.', ',') + "t", mat_color)
-                            display_dial("VIDRO", str(round(materiais[2],2)).replace('.', ',') + "t", mat_color)
-                            display_dial("METAIS", str(round(materiais[3],2)).replace('.', ',') + "t", mat_color)
-                            display_dial("EMB. MULTICAMADAS", str(round(materiais[4],2)).replace('.', ',') + "t", mat_color)
-                            display_dial("TEX. COUR. BOR.", str(round(materiais[5],2)).replace('.', ',') + "t", mat_color)
-                            display_dial("MAT. ORGANICA", str(round(materiais[6],2)).replace('.', ',') + "t", mat_color)
-                            display_dial("REJEITOS", str(round(materiais[7],2)).replace('.', ',') + "t", mat_color)
-                            st.write(" ")
-                            st.write(" ")
-                            display_dial("TOTAL", str(round(total_v,2)).replace('.', ',') + "t", tot_color)
-
-                elif medida_proj == 'Quilograma (kg)':
-                    var_res = []
-                    for material in materiais:
-                        var_res.append(material / 1000)
-                    materiais = var_res
-                    total_v = total_v / 1000
-                    st.write(" ")
-                    
-                    with c1:
-                        display_dial("PLÁSTICO", str(round(materiais[0],2)).replace('.', ',') + "kg", mat_color)
-                        display_dial("PAPEL E PAPELÃO", str(round(materiais[1],2)).replace('.', ',') + "kg", mat_color)
-                        display_dial("VIDRO", str(round(materiais[2],2)).replace('.', ',') + "kg", mat_color)
-                        display_dial("METAIS", str(round(materiais[3],2)).replace('.', ',') + "kg", mat_color)
-                        display_dial("EMB. MULTICAMADAS", str(round(materiais[4],2)).replace('.', ',') + "kg", mat_color)
-                        display_dial("TEX. COUR. BOR.", str(round(materiais[5],2)).replace('.', ',') + "kg", mat_color)
-                        display_dial("MAT. ORGANICA", str(round(materiais[6],2)).replace('.', ',') + "kg", mat_color)
-                        display_dial("REJEITOS", str(round(materiais[7],2)).replace('.', ',') + "kg", mat_color)
-                        st.write(" ")
-                        st.write(" ")
-                        display_dial("TOTAL", str(round(total_v,2)).replace('.', ',') + "kg", tot_color)
-
-                else: # medida == Grama (g)
-                    st.write(" ")
-                    with c1:
-                        display_dial("PLÁSTICO", str(round(materiais[0],2)).replace('.', ',') + "g", mat_color)
-                        display_dial("PAPEL E PAPELÃO", str(round(materiais[1],2)).replace('.', ',') + "g", mat_color)
-                        display_dial("VIDRO", str(round(materiais[2],2)).replace('.', ',') + "g", mat_color)
-                        display_dial("METAIS", str(round(materiais[3],2)).replace('.', ',') + "g", mat_color)
-                        display_dial("EMB. MULTICAMADAS", str(round(materiais[4],2)).replace('.', ',') + "g", mat_color)
-                        display_dial("TEX. COUR. BOR.", str(round(materiais[5],2)).replace('.', ',') + "g", mat_color)
-                        display_dial("MAT. ORGANICA", str(round(materiais[6],2)).replace('.', ',') + "g", mat_color)
-                        display_dial("REJEITOS", str(round(materiais[7],2)).replace('.', ',') + "g", mat_color)
-                        st.write(" ")
-                        st.write(" ")
-                        display_dial("TOTAL", str(round(total_v,2)).replace('.', ',') + "g", tot_color)
-
-            materiais_g = materiais
+            c1, c2, c3 = st.columns(3)
+            c1.markdown(dials.render(
+                *[dials.dial(rotulo, formatar(valor), mat_color) for rotulo, valor in zip(ROTULOS[fatia], materiais)],
+                dials.dial("TOTAL", formatar(total_v), tot_color),
+            ), unsafe_allow_html=True)
 
             # Resultados
-            proporcao = []
-            for i in materiais_g:
-                proporcao.append(i / total_v)
-            proporcao = pd.DataFrame(proporcao)
+            with metrics.timer('plotly'):
+                proporcao = pd.DataFrame(materiais / total_v)
 
-            #colors_pie = ['Plástico','Papel e Papelão','Vidro','Metais','Emb. Mult.','Tex. Cour. Bor.','Mat.Org.']
-            colors_pie = ['#4e90cd','#46936e','#adc7cf','#565a68','#f1bd5d','#e48a37','#b25b32','#28333d']
-
-            df_prop = proporcao.rename(columns={0: 'Proporcao'})
-            df_pie = pd.concat([df_prop, pd.DataFrame(names)], axis=1)
-            df_pie = df_pie.rename(columns={0: 'Material'})
-            fig = px.pie(df_pie, values=df_pie['Proporcao'], names=df_pie['Material'], title='Proporção dos resíduos')
-            fig.update_traces(marker=dict(colors=colors_pie))
-            c2.write(fig)
+                df_prop = proporcao.rename(columns={0: 'Proporcao'})
+                df_pie = pd.concat([df_prop, pd.DataFrame(names)], axis=1)
+                df_pie = df_pie.rename(columns={0: 'Material'})
+                fig = px.pie(df_pie, values=df_pie['Proporcao'], names=df_pie['Material'], title='Proporção dos resíduos')
+                fig.update_traces(marker=dict(colors=CORES))
+                c2.write(fig)
 
             if calc_volume:
-                if material_tipo == "Recicláveis":
-                    total = total_rec / 1000000
-                elif material_tipo == "Não-recicláveis":
-                    total = total_n_rec / 1000000
+                i_densidade = density_index(den_comp)
+                if tipo_proj == 'Por pessoa':
+                    i_pessoas = list(PESSOAS).index(media_pessoa)
+                    volume_at = superficie['volume_per_capita'][i_tempo, i_grupo, i_pessoas, i_densidade]
+                    volume_text = str(round(volume_at, 2)).replace('.', ',') + " L"
                 else:
-                    total = total / 1000000
-
-                volume_at = total / den_comp
+                    volume_at = superficie['volume'][i_tempo, i_grupo, i_densidade]
+                    volume_text = str(round(volume_at, 2)).replace('.', ',') + " m³"
 
-                with c2:
-                    st.markdown("<h5 style='text-align: center;'>Volume de aterro (ton)</h5>", unsafe_allow_html=True)
-                    display_dial("VOLUME", str(round(volume_at,2)).replace('.', ',') + " t", mat_color)
+                c2.markdown(dials.render(dials.dial("VOLUME DE ATERRO", volume_text, mat_color)), unsafe_allow_html=True)
 
             if comp_emb:
                 proporcao = []
@@ -898,14 +451,68 @@ if selected == "Visualização":
                 df_prop = proporcao.rename(columns={0: 'Proporcao'})
                 df_pie = pd.concat([df_prop, pd.DataFrame(names)], axis=1)
                 df_pie = df_pie.rename(columns={0: 'Material'})
-                fig = px.pie(df_pie, values=df_pie['Proporcao'], names=df_pie['Material'], title='Proporção dos resíduos')
-                c2.write(fig)
+                with metrics.timer('plotly'):
+                    fig = px.pie(df_pie, values=df_pie['Proporcao'], names=df_pie['Material'], title='Proporção dos resíduos')
+                    c2.write(fig)
+
+            if varredura:
+                c1, c2, c3 = st.columns([1,2,1])
+                with metrics.timer('plotly'), c2:
+                    fig = px.imshow(
+                        superficie['volume_per_capita'][i_tempo, i_grupo],
+                        x=DENSIDADES, y=PESSOAS, aspect='auto', color_continuous_scale='Blues',
+                        labels={'x': 'Densidade compactada (t/m³)', 'y': 'Pessoas por domicílio', 'color': 'Litros por pessoa'},
+                        title='Volume de aterro por pessoa (%s)' % tempo_proj.lower(),
+                    )
+                    st.write(fig)
+                c2.table(pd.DataFrame({
+                    'Pessoas por domicílio': PESSOAS,
+                    'Geração por pessoa (kg)': superficie['per_capita'][i_tempo, i_grupo],
+                    'Volume a 0,60 t/m³ (L)': superficie['volume_per_capita'][i_tempo, i_grupo, :, 0],
+                    'Volume a 0,80 t/m³ (L)': superficie['volume_per_capita'][i_tempo, i_grupo, :, -1],
+                }).set_index('Pessoas por domicílio').round(3))
 
         else: # First run
             c1, c2, c3 = st.columns([1,2,1])
             st.write(' ')
             c2.error("É necessário primeiramente **realizar a predição** para visualizar os resultados.", icon="🤖")
 
+    # Multi-year landfill projection, redrawn on every change of its inputs
+    if is_there:
+        import numpy as np
+        from sadgrs.projection import CENARIOS, project_years
+
+        st.markdown("---")
+        st.markdown("<h3 style='text-align: center;'>Projeção plurianual do aterro</h3>", unsafe_allow_html=True)
+
+        a, b, c, d = st.columns([1, 1, 1, 1])
+        horizonte = b.slider('Horizonte (anos):', 10, 30, 20)
+        densidade = c.slider('Densidade compactada (t/m³):', 0.6, 0.8, 0.7)
+        with b.expander('Crescimento anual (%)'):
+            taxas = np.array([
+                [
+                    st.number_input('%s: %s' % (cenario, serie), value=valor, step=0.1, key='taxa_%s_%s' % (cenario, serie))
+                    for serie, valor in zip(('domicílios', 'população'), valores)
+                ]
+                for cenario, valores in CENARIOS.items()
+            ]) / 100
+        cenarios = list(CENARIOS)
+        anos = project_years(resultado['materiais'], taxas[:, 0], taxas[:, 1], anos=horizonte, densidade=densidade)
+
+        i_grupo = GRUPOS.index(material_tipo)
+        df_anos = pd.DataFrame({
+            'Ano': np.tile(anos['anos'], len(cenarios)),
+            'Cenário': np.repeat(cenarios, horizonte),
+            'Toneladas no ano': anos['toneladas'][0, :, :, i_grupo].ravel(),
+            'Toneladas acumuladas': anos['toneladas_acumuladas'][0, :, :, i_grupo].ravel(),
+            'Volume acumulado (m³)': anos['volume_acumulado'][0, :, :, i_grupo].ravel(),
+        })
+        c1, c2, c3 = st.columns([1,2,1])
+        with metrics.timer('plotly'), c2:
+            fig = px.line(df_anos, x='Ano', y='Volume acumulado (m³)', color='Cenário', title='Volume de aterro - %s' % material_tipo)
+            st.write(fig)
+        c2.table(df_anos[df_anos['Ano'] == horizonte].set_index('Cenário').drop(columns='Ano').round(2))
+
 # Page models
 if selected == "Modelagem":
     a, b, c= st.columns([1, 2, 1])
@@ -917,42 +524,119 @@ if selected == "Modelagem":
     """
     )
 
-    files_dir = []
-    dir_path = './models/'
-    # Iterate directory
-    for path in os.listdir(dir_path):
-        # check if current path is a file
-        if os.path.isfile(os.path.join(dir_path, path)):
-            files_dir.append(path)
-    print(files_dir)
+    files_dir = registry.list_models()
 
     default_municipio = 'Campo Grande'
 
-    f = open('./data/cidades_ms.json', encoding="utf8") 
-    data = json.load(f)
-    municipios = data['cidades']
-    municipio = b.selectbox("Selecione o município", municipios,index=19)
-    f.close()
+    municipio = b.selectbox("Selecione o município", resources.municipios(), index=19)
 
+    new_uploaded = None
     new_gravimetria = b.checkbox('Enviar novos dados de gravimetria')
     if new_gravimetria:
             new_uploaded = b.file_uploader("Enviar arquivo .XLSX", type=".xlsx")
+            modelo_atualizar = b.selectbox("Modelo cujas estatísticas serão atualizadas", list(files_dir))
+            if b.button('Incorporar dados às estatísticas do modelo'):
+                if new_uploaded is None:
+                    b.error("Envie os dados de gravimetria para atualizar as estatísticas.")
+                else:
+                    from sadgrs.training import update_statistics
+
+                    # New surveys are folded into the stored moments; older versions are kept
+                    try:
+                        versao = update_statistics(modelo_atualizar, new_uploaded.getvalue())
+                    except (LookupError, ValueError) as e:
+                        b.error(str(e))
+                    else:
+                        b.success("Estatísticas de **%s** atualizadas (versão %d)." % (modelo_atualizar, versao))
+
+    qntd_clas_box = ['2', '3', '4', '5', '6', '7']
+    tipo_k = ['Linear', 'RBF','Sigmoid']
+    param_clas = '3'
+    param_prop_train_test = 0.3
+    tipo_kernel = 'RBF'
+    busca_completa = False
 
     new_param = b.checkbox('Alterar parâmetros do modelo')
     if new_param:
         selected_model = b.selectbox("Selecione o modelo", list(files_dir), 0)
-        model_path = './models/' + selected_model
-        loaded_model = pickle.load(open(model_path, 'rb'))
+        loaded_model = registry.load(selected_model)
 
-        qntd_clas_box = ['1', '2', '3', '4', '5', '6', '7']
-        tipo_k = ['Linear', 'RBF','Sigmoid']
-        
         a, b, c, d = st.columns([1, 1, 1, 1])
-        param_clas = b.selectbox("Selecione a quantidade de classes:", qntd_clas_box)
-        param_prop_train_test = c.slider('Informe a proporção de dados de teste:', 0.1, 1.0, 0.3)
+        param_clas = b.selectbox("Selecione a quantidade de classes:", qntd_clas_box, qntd_clas_box.index(param_clas))
+        param_prop_train_test = c.slider('Informe a proporção de dados de teste:', 0.1, 0.9, 0.3)
 
         tipo_kernel = b.selectbox("Selecione o tipo de kernel:", tipo_k)
+        busca_completa = c.checkbox('Buscar a melhor combinação de classes e kernel')
 
     c.write(" ")
 
-    gerar = b.button('Treinar modelo')
\ No newline at end of file
+    gerar = b.button('Treinar modelo')
+
+    if gerar:
+        if new_uploaded is None:
+            b.error("Envie os dados de gravimetria para treinar um modelo.")
+        else:
+            from sadgrs.jobs import jobs
+            from sadgrs.cache import cache_key
+            from sadgrs.ingest import source_digest
+            from sadgrs.training import training_job
+
+            if busca_completa:
+                classes_list = [int(k) for k in qntd_clas_box]
+                kernels = tipo_k
+            else:
+                classes_list = [int(param_clas)]
+                kernels = [tipo_kernel]
+            dados = new_uploaded.getvalue()
+            # Training runs in background so the page stays responsive
+            key = cache_key('treino', source_digest(dados), classes_list, kernels, param_prop_train_test)
+            jobs.submit(key, training_job, dados, classes_list, kernels, param_prop_train_test)
+            st.session_state['job_treino'] = key
+
+    if st.session_state.get('job_treino'):
+        import time
+        from sadgrs.jobs import jobs
+
+        job = jobs.get(st.session_state['job_treino'])
+        if job is not None:
+            a, b, c = st.columns([1, 2, 1])
+            if not job.wait(timeout=0.5):
+                b.progress(job.progress, text=job.message or 'Treinando...')
+                time.sleep(1)
+                st.experimental_rerun()
+            tempos_job = job.timings
+            try:
+                treino = job.result()
+            except Exception as e:
+                b.error("Não foi possível treinar o modelo: %s" % e)
+            else:
+                b.success("Modelo **%s** salvo (estatísticas v%d)." % (treino['modelo'], treino['versao']))
+                b.table(treino['resultados'])
+
+# Diagnostics panel, filled once the page is done
+if diagnostico:
+    with st.sidebar:
+        st.markdown("**Tempos desta execução**")
+        if tempos or tempos_job:
+            st.table([
+                {'Etapa': r['stage'], 'Linhas': r['rows'], 'ms': round(r['seconds'] * 1000, 1)}
+                for r in tempos_job + tempos
+            ])
+        else:
+            st.caption("Nenhuma etapa medida.")
+        st.markdown("**Percentis (todas as sessões)**")
+        st.table(metrics.summary())
+        if warmup.ready.is_set():
+            st.caption("Aquecimento concluído em %.1f s" % warmup.status['segundos'])
+            for erro in warmup.status['erros']:
+                st.caption("Falha no aquecimento: %s" % erro)
+        else:
+            st.caption("Aquecimento em andamento...")
+        st.markdown("**Recursos compartilhados**")
+        st.caption("%.1f de %d MB" % (
+            resources.cache.memory_usage() / 1048576, resources.cache.budget // 1048576,
+        ))
+        st.table(resources.cache.report())
+        st.download_button("Exportar (Prometheus)", metrics.prometheus_text(), file_name='sadgrs.prom')
+        if metrics.METRICS_LOG:
+            st.caption("Medições em JSON lines: %s" % metrics.METRICS_LOG)
@@ -0,0 +1 @@
+"""Supporting modules for the SAD GRS Streamlit app (home.py)."""
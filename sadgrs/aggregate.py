@@ -0,0 +1,55 @@
+"""Aggregation of class predictions into material estimates.
+
+The class statistics are stacked as matrices with one row per class and one
+column per material, so any number of classes is handled by the same batched
+array operations.
+"""
+import numpy as np
+
+MATERIAIS = ['Plástico', 'Papel e Papelão', 'Vidro', 'Metais', 'Emb. Mult.', 'Tex. Cour. Bor.', 'Mat. Org.', 'Rejeitos']
+ROTULOS = ['PLÁSTICO', 'PAPEL E PAPELÃO', 'VIDRO', 'METAIS', 'EMB. MULTICAMADAS', 'TEX. COUR. BOR.', 'MAT. ORGANICA', 'REJEITOS']
+EMBALAGENS = ['P_Emb', 'P_N_Emb']
+# Chart colour of each material
+CORES = ['#4e90cd', '#46936e', '#adc7cf', '#565a68', '#f1bd5d', '#e48a37', '#b25b32', '#28333d']
+# Materials 0..5 are recyclable, 6..7 are not
+N_RECICLAVEIS = 6
+
+
+def class_counts(res_clas, classes, weights=None):
+    """Households per class, aligned with `classes`; absent classes count 0.
+
+    `weights` gives the number of households behind each prediction (one
+    each by default).
+    """
+    labels, inverse = np.unique(np.asarray(res_clas), return_inverse=True)
+    counts = np.bincount(inverse.ravel(), weights=weights, minlength=len(labels)).astype(np.int64)
+    index = {label: i for i, label in enumerate(classes)}
+    qntd_clas = np.zeros(len(classes), dtype=np.int64)
+    for label, count in zip(labels.tolist(), counts):
+        if label not in index:
+            raise ValueError('Classe %r não possui estatísticas' % (label,))
+        qntd_clas[index[label]] += count
+    return qntd_clas
+
+
+def aggregate(qntd_clas, media, media_emb):
+    """Totals for every material at once.
+
+    `qntd_clas` has one entry per class, `media` is (classes x materials) and
+    `media_emb` is (classes x 2). Values keep the units of the statistics
+    (grams per day). Confidence intervals come from sadgrs.bootstrap.
+    """
+    qntd_clas = np.asarray(qntd_clas, dtype=float)
+    media = np.asarray(media, dtype=float)
+    presentes = qntd_clas > 0
+    if not presentes.any():
+        raise ValueError('Nenhum domicílio classificado')
+
+    # Absent classes contribute nothing, even where their statistics are NaN
+    pesos = qntd_clas[presentes]
+    return {
+        'qntd_clas': qntd_clas.astype(np.int64),
+        'totais': pesos @ media[presentes],
+        'media_classes': media[presentes].mean(axis=0),
+        'media_p_emb': np.asarray(media_emb, dtype=float)[presentes].mean(axis=0),
+    }
@@ -0,0 +1,115 @@
+"""Local cache for the Lottie animations used by the app.
+
+Animations are read from ./images/lottie/ and kept in memory for the whole
+server process. One that is not on disk yet is downloaded by a background
+thread with a short timeout, so rendering never waits on the network; until
+it arrives (or forever, on offline hosts) the caller gets None and shows a
+local fallback instead. A failed download is not retried by the next rerun:
+each URL waits BACKOFF seconds after its first failure, doubling up to
+BACKOFF_MAX, before another background attempt.
+
+To bundle the animations with a deployment, run once on a connected host:
+    python -m sadgrs.assets
+"""
+import os
+import json
+import time
+import hashlib
+import threading
+
+LOTTIE_DIR = './images/lottie/'
+TIMEOUT = 3
+BACKOFF = 60
+BACKOFF_MAX = 3600
+LOTTIE_SIDEBAR = "https://assets4.lottiefiles.com/packages/lf20_D2Bl7ZTvwe.json"
+LOTTIE_HOME = "https://assets2.lottiefiles.com/temp/lf20_3bpCnZ.json"
+
+_lock = threading.Lock()
+_memory = {}
+_pending = set()
+# url -> (consecutive failures, time of the next attempt)
+_failures = {}
+
+
+def load_lottiefile(filepath: str):
+    with open(filepath, "r") as f:
+        return json.load(f)
+
+
+def lottie_path(url):
+    name = os.path.splitext(os.path.basename(url))[0]
+    return os.path.join(LOTTIE_DIR, '%s-%s.json' % (name, hashlib.sha1(url.encode()).hexdigest()[:8]))
+
+
+def fetch(url):
+    """Download an animation to disk; returns it, or None on failure."""
+    import requests
+
+    try:
+        r = requests.get(url, timeout=TIMEOUT)
+        if r.status_code != 200:
+            return _failed(url)
+        data = r.json()
+    except (requests.RequestException, ValueError):
+        return _failed(url)
+    os.makedirs(LOTTIE_DIR, exist_ok=True)
+    path = lottie_path(url)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(data, f)
+    os.replace(path + '.tmp', path)
+    with _lock:
+        _memory[url] = data
+        _failures.pop(url, None)
+    return data
+
+
+def _failed(url):
+    with _lock:
+        falhas = _failures.get(url, (0, 0))[0] + 1
+        _failures[url] = (falhas, time.time() + min(BACKOFF * 2 ** (falhas - 1), BACKOFF_MAX))
+    return None
+
+
+def _fetch_pending(url):
+    try:
+        fetch(url)
+    finally:
+        with _lock:
+            _pending.discard(url)
+
+
+def prefetch(*urls):
+    """Start background downloads for the animations not cached yet."""
+    for url in urls:
+        with _lock:
+            if url in _memory or url in _pending or os.path.exists(lottie_path(url)):
+                continue
+            if time.time() < _failures.get(url, (0, 0))[1]:
+                continue
+            _pending.add(url)
+        threading.Thread(target=_fetch_pending, args=(url,), daemon=True).start()
+
+
+def load_lottie(url):
+    """Animation for `url` from memory or disk, or None if not available yet."""
+    with _lock:
+        data = _memory.get(url)
+    if data is not None:
+        return data
+    path = lottie_path(url)
+    if os.path.exists(path):
+        data = load_lottiefile(path)
+        with _lock:
+            _memory[url] = data
+        return data
+    prefetch(url)
+    return None
+
+
+def main():
+    for url in (LOTTIE_SIDEBAR, LOTTIE_HOME):
+        print(('ok    ' if fetch(url) is not None else 'falha ') + lottie_path(url))
+
+
+if __name__ == '__main__':
+    main()
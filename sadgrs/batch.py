@@ -0,0 +1,115 @@
+"""Headless statewide prediction.
+
+Matches the IPTU spreadsheets in a directory to the municipalities listed in
+./data/cidades_ms.json (by file name, ignoring case, accents and
+separators), runs the predict-and-aggregate pipeline for each one in a
+process pool and writes a single consolidated table. The CPU cores are
+shared between the processes: each one classifies with cores / processes
+threads, so the pool does not oversubscribe the machine.
+
+Usage:
+    python -m sadgrs.batch ./iptu_ms/ --model Classificacao.sav --out resultado_ms.csv
+"""
+import os
+import sys
+import argparse
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from sadgrs import stats, resources
+from sadgrs.ingest import ingest
+from sadgrs.pipeline import estimate
+from sadgrs.aggregate import MATERIAIS
+
+CIDADES_PATH = resources.CIDADES_PATH
+
+
+def normalize(name):
+    name = unicodedata.normalize('NFKD', name)
+    name = ''.join(c for c in name if not unicodedata.combining(c))
+    for sep in '_-.':
+        name = name.replace(sep, ' ')
+    return ' '.join(name.lower().split())
+
+
+def load_municipios(path=CIDADES_PATH):
+    return resources.municipios(path)
+
+
+def match_files(dir_path, municipios):
+    """(municipio -> path, unmatched file names) for the .xlsx files in dir_path."""
+    by_name = {normalize(m): m for m in municipios}
+    matched, unmatched = {}, []
+    for name in sorted(os.listdir(dir_path)):
+        stem, ext = os.path.splitext(name)
+        if ext.lower() != '.xlsx':
+            continue
+        municipio = by_name.get(normalize(stem))
+        if municipio is None:
+            unmatched.append(name)
+        else:
+            matched[municipio] = os.path.join(dir_path, name)
+    return matched, unmatched
+
+
+def run_municipio(municipio, path, model_name, threads=1):
+    resultado = estimate(model_name, ingest(path), workers=threads)
+    row = {'municipio': municipio, 'arquivo': os.path.basename(path), 'domicilios': resultado['qntd_dom']}
+    for k, qntd in enumerate(resultado['qntd_clas'], start=1):
+        row['classe_%d' % k] = int(qntd)
+    for material, total, inf, sup in zip(MATERIAIS, resultado['totais'], resultado['inferior'], resultado['superior']):
+        row[material + ' (g/dia)'] = total
+        row[material + ' inf. (g/dia)'] = inf
+        row[material + ' sup. (g/dia)'] = sup
+    row['Total (g/dia)'] = np.nansum(resultado['totais'])
+    row['Total inf. (g/dia)'] = resultado['total_inferior']
+    row['Total sup. (g/dia)'] = resultado['total_superior']
+    return row
+
+
+def run(dir_path, model_name, workers=None):
+    municipios = load_municipios()
+    matched, unmatched = match_files(dir_path, municipios)
+    for name in unmatched:
+        print('Arquivo ignorado (município não encontrado): %s' % name, file=sys.stderr)
+    rows = []
+    workers = workers or os.cpu_count() or 1
+    # Classification threads per process
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(run_municipio, municipio, path, model_name, threads): municipio
+            for municipio, path in matched.items()
+        }
+        for future in as_completed(futures):
+            try:
+                rows.append(future.result())
+            except Exception as e:
+                print('Falha em %s: %s' % (futures[future], e), file=sys.stderr)
+    ordem = {m: i for i, m in enumerate(municipios)}
+    rows.sort(key=lambda row: ordem[row['municipio']])
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Predição em lote para os municípios de MS')
+    parser.add_argument('dir', help='diretório com uma planilha .xlsx de IPTU por município')
+    parser.add_argument('--model', default='Classificacao.sav', help='arquivo do modelo em ./models/')
+    parser.add_argument('--out', default='resultado_ms.csv')
+    parser.add_argument('--workers', type=int, default=None, help='processos (padrão: núcleos da CPU)')
+    args = parser.parse_args()
+
+    if stats.load(args.model) is None:
+        parser.error('o modelo %s não possui estatísticas das classes' % args.model)
+
+    import pandas as pd
+
+    rows = run(args.dir, args.model, args.workers)
+    pd.DataFrame(rows).to_csv(args.out, index=False)
+    print('%d municípios gravados em %s' % (len(rows), args.out))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Bootstrap confidence intervals of the material estimates.
+
+The estimate of a material is sum_k N_k * mean_k, with N_k the households
+classified in class k and mean_k the survey mean of the class. Every
+replicate redraws the survey records of each class with replacement and
+recomputes the estimate; the interval is given by percentiles of the
+replicates. A whole block of replicates is drawn at once, as a matrix of
+record indices per material whose rows are averaged, so memory is bounded by
+the block size, whatever the number of replicates or households.
+
+Each material is resampled among the records that measured it, so its class
+mean is defined in every replicate, or in none when the class never measured
+it; such a material is then left out of the total of every replicate, as it
+is from the point estimate. Statistics without survey records (converted
+from the legacy pickles) replicate the class means from their normal
+approximation instead, with the standard error taken from the stored 95%
+margins.
+"""
+import os
+import warnings
+
+import numpy as np
+
+from sadgrs.stats import Z_95
+from sadgrs.aggregate import MATERIAIS
+
+REPLICATES = int(os.environ.get('SADGRS_BOOTSTRAP_REPLICATES', 2000))
+BLOCK_SIZE = 256
+SEED = 0
+LEVEL = 0.95
+# Part of the cache key of predictions, change it when the method changes
+METHOD = 'bootstrap-3'
+
+
+def _resampler(amostras):
+    """Draws bootstrap means (size x materials) of one class from its records."""
+    colunas = [amostras[~np.isnan(amostras[:, j]), j] for j in range(amostras.shape[1])]
+
+    def draw(rng, size):
+        medias = np.full((size, len(colunas)), np.nan)
+        for j, valores in enumerate(colunas):
+            if len(valores):
+                medias[:, j] = valores[rng.integers(0, len(valores), (size, len(valores)))].mean(axis=1)
+        return medias
+    return draw
+
+
+def _normal(media, margem):
+    """Draws class means from N(media, (margem / 1.96)^2)."""
+    erro = np.nan_to_num(np.asarray(margem, dtype=float) / Z_95)
+
+    def draw(rng, size):
+        return media + erro * rng.standard_normal((size, len(media)))
+    return draw
+
+
+def intervals(qntd_clas, estatisticas, replicates=REPLICATES, level=LEVEL, seed=SEED, block_size=BLOCK_SIZE):
+    """Percentile intervals (g/day) of each material and of the total.
+
+    `qntd_clas` is aligned with estatisticas['classes']. The same seed
+    always gives the same intervals.
+    """
+    qntd_clas = np.asarray(qntd_clas, dtype=float)
+    classes = estatisticas['classes'].tolist()
+    presentes = np.flatnonzero(qntd_clas > 0)
+    if 'amostras' in estatisticas:
+        amostras = np.asarray(estatisticas['amostras'], dtype=float)
+        rotulos = np.asarray(estatisticas['rotulos'])
+        sorteios = [_resampler(amostras[rotulos == classes[k]]) for k in presentes]
+    else:
+        sorteios = [_normal(estatisticas['media'][k], estatisticas['margem'][k]) for k in presentes]
+
+    rng = np.random.default_rng(seed)
+    replicas = np.empty((replicates, len(MATERIAIS)))
+    for inicio in range(0, replicates, block_size):
+        bloco = replicas[inicio:inicio + block_size]
+        bloco[:] = 0.0
+        for k, sorteio in zip(presentes, sorteios):
+            bloco += qntd_clas[k] * sorteio(rng, len(bloco))
+
+    alfa = (1 - level) / 2 * 100
+    with warnings.catch_warnings():
+        # Materials never measured have no interval
+        warnings.simplefilter('ignore', RuntimeWarning)
+        inferior, superior = np.nanpercentile(replicas, [alfa, 100 - alfa], axis=0)
+        total_inferior, total_superior = np.percentile(np.nansum(replicas, axis=1), [alfa, 100 - alfa])
+    return {
+        'inferior': inferior,
+        'superior': superior,
+        'total_inferior': float(total_inferior),
+        'total_superior': float(total_superior),
+    }
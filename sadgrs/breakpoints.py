@@ -0,0 +1,144 @@
+"""Compile single-feature classifiers into sorted breakpoint tables.
+
+Every model takes IPTU as its only input, so whatever the algorithm (Naive
+Bayes, decision tree, KNN, SVM) it is a piecewise-constant function of one
+number. Compiling samples the model over an IPTU range, locates every class
+change by vectorized bisection and stores the result as
+
+    edges   sorted IPTU values where the class changes
+    labels  class of each interval, len(edges) + 1 entries
+    lo, hi  range the table was compiled for
+
+Inside [lo, hi] prediction is a single searchsorted; values outside the range
+still go through the model. A table is only saved when it agrees with the
+model on every value of the verification data, and it is tied to the sha256
+of the model file, so a retrained model never uses a stale table.
+
+Usage:
+    python -m sadgrs.breakpoints Classificacao.sav --data ./data/IPTU_MEDIO_RESIDENCIAL_CG.xlsx
+"""
+import os
+import json
+import argparse
+
+import numpy as np
+
+from sadgrs import resources
+from sadgrs.models import registry
+
+COMPILED_DIR = './models/compiled/'
+N_SAMPLES = 200000
+BISECT_STEPS = 60
+
+
+def _predict(model, x):
+    from sadgrs.pipeline import predict_classes
+
+    return np.asarray(predict_classes(model, x))
+
+
+def compile_model(model, lo, hi, n_samples=N_SAMPLES):
+    """Breakpoint table of `model` over [lo, hi]."""
+    grid = np.linspace(lo, hi, n_samples)
+    if lo > 0:
+        # IPTU is heavily skewed, sample the low end more densely as well
+        grid = np.union1d(grid, np.geomspace(lo, hi, n_samples))
+    labels = _predict(model, grid)
+    change = np.flatnonzero(labels[1:] != labels[:-1])
+
+    # Bisect all class changes at once: a keeps the left class, b the right
+    a, b = grid[change], grid[change + 1]
+    left = labels[change]
+    for _ in range(BISECT_STEPS):
+        if len(a) == 0:
+            break
+        m = (a + b) / 2
+        same = _predict(model, m) == left
+        a = np.where(same, m, a)
+        b = np.where(same, b, m)
+    return {
+        'edges': b,
+        'labels': np.concatenate([labels[:1], labels[change + 1]]),
+        'lo': np.float64(lo),
+        'hi': np.float64(hi),
+    }
+
+
+def predict_table(table, x):
+    """Classes of values inside [lo, hi] using the table."""
+    return table['labels'][np.searchsorted(table['edges'], x, side='right')]
+
+
+def verify(model, table, x):
+    """Fraction of values in `x` where the table agrees with the model."""
+    x = np.unique(np.asarray(x, dtype=np.float64))
+    x = x[(x >= table['lo']) & (x <= table['hi'])]
+    if len(x) == 0:
+        return 1.0
+    return float(np.mean(predict_table(table, x) == _predict(model, x)))
+
+
+def compiled_path(model_name):
+    return os.path.join(COMPILED_DIR, os.path.splitext(os.path.basename(model_name))[0] + '.npz')
+
+
+def save(model_name, table, concordancia):
+    os.makedirs(COMPILED_DIR, exist_ok=True)
+    meta = {'modelo_sha256': registry.sha256(model_name), 'concordancia': concordancia}
+    path = compiled_path(model_name)
+    with open(path + '.tmp', 'wb') as f:
+        np.savez(f, meta=np.array(json.dumps(meta)), **table)
+    os.replace(path + '.tmp', path)
+    return path
+
+
+def load(model_name):
+    """The compiled table of a model, or None if missing or made for another model file."""
+    path = compiled_path(model_name)
+    if not os.path.exists(path):
+        return None
+
+    def read():
+        with np.load(path, allow_pickle=False) as data:
+            table = {name: data[name] for name in data.files if name != 'meta'}
+            table['meta'] = json.loads(str(data['meta']))
+        return table
+    table = resources.cache.get(('pontos de corte', path), read, signature=os.stat(path).st_mtime_ns)
+    if table['meta']['modelo_sha256'] != registry.sha256(model_name):
+        return None
+    return table
+
+
+def main():
+    from sadgrs.ingest import ingest, load_column
+
+    parser = argparse.ArgumentParser(description='Compila um modelo em uma tabela de pontos de corte')
+    parser.add_argument('model', help='arquivo do modelo em ./models/')
+    parser.add_argument('--data', required=True, help='planilha de IPTU usada para definir o intervalo e verificar')
+    parser.add_argument('--lo', type=float, help='menor IPTU (padrão: mínimo dos dados)')
+    parser.add_argument('--hi', type=float, help='maior IPTU (padrão: máximo dos dados)')
+    parser.add_argument('--samples', type=int, default=N_SAMPLES)
+    parser.add_argument('--verify-only', action='store_true', help='apenas verifica a tabela existente')
+    args = parser.parse_args()
+
+    model = registry.load(args.model)
+    x = load_column(ingest(args.data))
+    if args.verify_only:
+        table = load(args.model)
+        if table is None:
+            parser.error('não há tabela compilada válida para %s' % args.model)
+        print('concordância: %.6f' % verify(model, table, x))
+        return
+
+    lo = np.nanmin(x) if args.lo is None else args.lo
+    hi = np.nanmax(x) if args.hi is None else args.hi
+    table = compile_model(model, float(lo), float(hi), args.samples)
+    concordancia = verify(model, table, x)
+    print('%d pontos de corte, concordância: %.6f' % (len(table['edges']), concordancia))
+    if concordancia < 1.0:
+        raise SystemExit('A tabela diverge do modelo; aumente --samples')
+    print(save(args.model, table, concordancia))
+
+
+if __name__ == '__main__':
+    main()
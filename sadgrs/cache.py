@@ -0,0 +1,102 @@
+"""Cache of prediction results keyed by model, statistics and dataset hashes.
+
+The key combines the sha256 of the model file, the version of its class
+statistics and the content hash of the IPTU data, so a hit is always the
+result the full pipeline would produce. Results are kept in a bounded LRU in
+memory and optionally persisted to disk to survive restarts. The persisted
+files are bounded by the same maxsize: a hit refreshes the file mtime and
+the least recently used files are removed when a result is stored.
+"""
+import os
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+PREDICTIONS_DIR = os.environ.get('SADGRS_PREDICTIONS_DIR', './data/cache/predictions/') or None
+PREDICTIONS_MAXSIZE = int(os.environ.get('SADGRS_PREDICTIONS_MAXSIZE', 256))
+
+
+def cache_key(*parts):
+    return hashlib.sha256('\0'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+class PredictionCache:
+    def __init__(self, maxsize=PREDICTIONS_MAXSIZE, persist_dir=PREDICTIONS_DIR):
+        self.maxsize = maxsize
+        self.persist_dir = persist_dir
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def _path(self, key):
+        return os.path.join(self.persist_dir, key + '.npz')
+
+    def get(self, key):
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                return result
+        if self.persist_dir is None:
+            return None
+        try:
+            with np.load(self._path(key), allow_pickle=False) as data:
+                result = {name: data[name] for name in data.files}
+            os.utime(self._path(key))
+        except FileNotFoundError:
+            # Never stored, or pruned by another process
+            return None
+        self._remember(key, result)
+        return result
+
+    def put(self, key, result):
+        result = {name: np.array(values) for name, values in result.items()}
+        if self.persist_dir is not None:
+            os.makedirs(self.persist_dir, exist_ok=True)
+            # One temporary file per writer, so concurrent puts of a key never interleave
+            fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=self.persist_dir)
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    np.savez(f, **result)
+                os.replace(tmp, self._path(key))
+            except BaseException:
+                os.remove(tmp)
+                raise
+            self._prune()
+        self._remember(key, result)
+        return result
+
+    def _prune(self):
+        """Remove the least recently used files beyond maxsize."""
+        files = []
+        for entry in os.scandir(self.persist_dir):
+            if entry.name.endswith('.npz'):
+                try:
+                    files.append((entry.stat().st_mtime, entry.path))
+                except FileNotFoundError:
+                    pass
+        files.sort()
+        for _, path in files[:max(len(files) - self.maxsize, 0)]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _remember(self, key, result):
+        # Shared by every session, so the arrays are made read-only
+        for values in result.values():
+            values.setflags(write=False)
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+predictions = PredictionCache()
@@ -0,0 +1,50 @@
+"""Metric dials of the app pages, rendered as a single HTML document.
+
+Every st.markdown call is a separate delta sent to the browser, so instead of
+one call per dial (plus blank st.write calls for spacing) a page builds all
+its dials into CSS grids and sends them as one element.
+"""
+from htbuilder.units import rem
+from htbuilder import div, big, h2, h3, h5, styles
+
+
+def dial(title, value, color, size=2.6):
+    return div(
+        style=styles(
+            text_align="center",
+            color=color,
+            padding=(rem(0.8), 0, rem(3), 0),
+        )
+    )(
+        h2(style=styles(font_size=rem(0.9), font_weight=600, padding=0))(title),
+        big(style=styles(font_size=rem(size), font_weight=800, line_height=1))(value),
+    )
+
+
+def heading(title, subtitle=None):
+    """Centred section title, as the h3/h5 headers used by the pages."""
+    elements = [h3(style=styles(text_align="center"))(title)]
+    if subtitle is not None:
+        elements.append(h5(style=styles(text_align="center"))(subtitle))
+    return div(style=styles(padding_bottom=rem(1.5)))(*elements)
+
+
+def grid(*columns, align="center"):
+    """Columns of equal width side by side; each column is a list of elements.
+
+    Columns are vertically aligned by the grid (`align` is the CSS
+    align-items value), so no spacer elements are needed.
+    """
+    return div(
+        style=styles(
+            display="grid",
+            grid_template_columns="repeat(%d, minmax(0, 1fr))" % len(columns),
+            align_items=align,
+            column_gap=rem(1),
+        )
+    )(*[div()(*column) for column in columns])
+
+
+def render(*elements):
+    """HTML of the elements, for one st.markdown(..., unsafe_allow_html=True)."""
+    return str(div()(*elements))
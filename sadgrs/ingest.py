@@ -0,0 +1,143 @@
+"""Content-addressed columnar cache for the IPTU spreadsheets.
+
+The first time a workbook is seen, only the IPTU column (and any household
+identifier columns) is parsed and written as one .npy file per column under
+./data/cache/<sha256>/. Every later rerun or session memory-maps those files
+instead of parsing the XLSX again; the mapped columns are shared by every
+session through sadgrs.resources.
+
+The columns hold municipal household data, so the cache is bounded: using a
+file refreshes the mtime of its folder, and after each new file the least
+recently used folders beyond SADGRS_INGEST_MAXSIZE, or unused for more than
+SADGRS_INGEST_MAX_AGE_DAYS, are removed.
+"""
+import os
+import time
+import shutil
+import hashlib
+import tempfile
+
+import numpy as np
+
+from sadgrs import metrics, resources
+from sadgrs.models import file_sha256
+
+CACHE_DIR = './data/cache/'
+INGEST_MAXSIZE = int(os.environ.get('SADGRS_INGEST_MAXSIZE', 32))
+INGEST_MAX_AGE = float(os.environ.get('SADGRS_INGEST_MAX_AGE_DAYS', 30)) * 86400
+IPTU_COLUMN = 'IPTU'
+ID_COLUMNS = ('id', 'inscricao', 'inscrição', 'codigo', 'código', 'matricula', 'matrícula')
+
+# (path, mtime, size) -> digest, so the default file is not re-hashed on every rerun
+_path_digests = {}
+
+
+def _is_id_column(name):
+    name = str(name).strip().lower()
+    return name in ID_COLUMNS or name.startswith('id_')
+
+
+def source_digest(source):
+    """sha256 of a file path, raw bytes or a Streamlit UploadedFile."""
+    if isinstance(source, (str, os.PathLike)):
+        stat = os.stat(source)
+        key = (os.path.abspath(source), stat.st_mtime_ns, stat.st_size)
+        digest = _path_digests.get(key)
+        if digest is None:
+            digest = file_sha256(source)
+            _path_digests[key] = digest
+        return digest
+    if not isinstance(source, bytes):
+        source = source.getvalue()
+    return hashlib.sha256(source).hexdigest()
+
+
+def _read_xlsx(source):
+    import io
+    import pandas as pd
+
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    elif not isinstance(source, (str, os.PathLike)):
+        source = io.BytesIO(source.getvalue())
+    with metrics.timer('read_excel') as timing:
+        df = pd.read_excel(source, usecols=lambda c: c == IPTU_COLUMN or _is_id_column(c))
+        timing['rows'] = len(df)
+    if IPTU_COLUMN not in df.columns:
+        raise ValueError("A planilha não possui a coluna '%s'" % IPTU_COLUMN)
+    columns = {IPTU_COLUMN: df[IPTU_COLUMN].to_numpy(dtype=np.float32)}
+    for name in df.columns:
+        if name == IPTU_COLUMN:
+            continue
+        values = df[name]
+        if pd.api.types.is_integer_dtype(values):
+            columns[str(name)] = values.to_numpy(dtype=np.int64)
+        else:
+            columns[str(name)] = values.astype(str).to_numpy(dtype=str)
+    return columns
+
+
+def _write(digest, columns):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=CACHE_DIR)
+    for name, values in columns.items():
+        np.save(os.path.join(tmp, name + '.npy'), values, allow_pickle=False)
+    try:
+        os.replace(tmp, os.path.join(CACHE_DIR, digest))
+    except OSError:
+        # Another worker finished the same file first
+        shutil.rmtree(tmp, ignore_errors=True)
+    _prune(keep=digest)
+
+
+def _touch(path):
+    try:
+        os.utime(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def _prune(keep):
+    """Remove the folders beyond INGEST_MAXSIZE or older than INGEST_MAX_AGE."""
+    folders = []
+    for entry in os.scandir(CACHE_DIR):
+        # Digest folders only, not the predictions or unfinished writes
+        if entry.is_dir() and len(entry.name) == 64 and entry.name != keep:
+            try:
+                folders.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:
+                pass
+    folders.sort(reverse=True)
+    limite = time.time() - INGEST_MAX_AGE
+    for i, (mtime, path) in enumerate(folders):
+        # The folder just written counts towards the size
+        if i + 1 >= INGEST_MAXSIZE or mtime < limite:
+            shutil.rmtree(path, ignore_errors=True)
+            resources.cache.invalidate(('colunas', path))
+
+
+def ingest(source):
+    """Make sure the source is in the columnar cache and return its digest."""
+    digest = source_digest(source)
+    if _touch(os.path.join(CACHE_DIR, digest)):
+        return digest
+    _write(digest, _read_xlsx(source))
+    return digest
+
+
+def columns(digest):
+    """Memory-mapped columns of an ingested file, keyed by column name."""
+    path = os.path.join(CACHE_DIR, digest)
+    _touch(path)
+
+    def read():
+        return {
+            name[:-4]: np.load(os.path.join(path, name), mmap_mode='r')
+            for name in os.listdir(path) if name.endswith('.npy')
+        }
+    return resources.cache.get(('colunas', path), read)
+
+
+def load_column(digest, column=IPTU_COLUMN):
+    return columns(digest)[column]
@@ -0,0 +1,105 @@
+"""Background jobs for long computations started from the app.
+
+Jobs run in a process-wide thread pool, so they outlive the Streamlit rerun
+that started them; the page just polls their progress. Jobs are identified by
+a key derived from their inputs and submitting an identical job joins the one
+already running, so two sessions uploading the same file share one
+computation. A job is cancelled once every session that joined it gave up.
+"""
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from sadgrs import metrics
+
+JOB_WORKERS = int(os.environ.get('SADGRS_JOB_WORKERS', os.cpu_count() or 1))
+# Finished jobs kept around so late pollers still find their result
+KEEP_FINISHED = 64
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, key):
+        self.key = key
+        self.progress = 0.0
+        self.message = ''
+        self.owners = set()
+        self.future = None
+        # Stage timings measured while the job ran (see sadgrs.metrics)
+        self.timings = []
+        self._cancel = threading.Event()
+
+    def report(self, progress, message=None):
+        """Called by the job function; raises JobCancelled when cancelled."""
+        if self._cancel.is_set():
+            raise JobCancelled(self.key)
+        self.progress = min(max(float(progress), 0.0), 1.0)
+        if message is not None:
+            self.message = message
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def done(self):
+        return self.future.done()
+
+    def wait(self, timeout=None):
+        wait([self.future], timeout=timeout)
+        return self.done()
+
+    def result(self):
+        return self.future.result()
+
+
+class JobManager:
+    def __init__(self, workers=JOB_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='sadgrs-job')
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+
+    def submit(self, key, fn, *args, owner=None):
+        """Run fn(job, *args) in background, or join the job already running for `key`."""
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None or job.cancelled or (job.done() and job.future.exception() is not None):
+                job = Job(key)
+                job.future = self._executor.submit(_run, job, fn, args)
+                self._jobs[key] = job
+                self._forget_finished()
+            job.owners.add(owner)
+            return job
+
+    def get(self, key):
+        with self._lock:
+            return self._jobs.get(key)
+
+    def cancel(self, key, owner=None):
+        """Leave a job; it is cancelled when no owner is left."""
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None:
+                return
+            job.owners.discard(owner)
+            if not job.owners and not job.done():
+                job._cancel.set()
+                job.future.cancel()
+                del self._jobs[key]
+
+    def _forget_finished(self):
+        finished = [key for key, job in self._jobs.items() if job.done()]
+        for key in finished[:max(len(finished) - KEEP_FINISHED, 0)]:
+            del self._jobs[key]
+
+
+def _run(job, fn, args):
+    with metrics.collect() as timings:
+        job.timings = timings
+        return fn(job, *args)
+
+
+jobs = JobManager()
@@ -0,0 +1,153 @@
+"""Lightweight per-stage timing of the app's hot paths.
+
+Stages are timed with `timer`. Each measurement goes to
+
+* the current collection of the running thread (the rerun of a page, or a
+  background job), shown by the diagnostics panel of home.py;
+* a rolling window per stage shared by every session, for percentiles;
+* when SADGRS_METRICS_LOG is set, a JSON lines log, appended in batches;
+* when SADGRS_METRICS_PROM is set, a Prometheus text file for
+  node_exporter's textfile collector.
+
+Both files are written outside the lock taken by the measurements.
+"""
+import os
+import json
+import time
+import atexit
+import threading
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+WINDOW = 1000
+QUANTILES = (0.5, 0.9, 0.99)
+METRICS_LOG = os.environ.get('SADGRS_METRICS_LOG') or None
+METRICS_PROM = os.environ.get('SADGRS_METRICS_PROM') or None
+PROM_INTERVAL = 10
+# Records buffered before the JSON lines log is appended to
+LOG_BATCH = 100
+LOG_INTERVAL = 10
+
+_local = threading.local()
+_lock = threading.Lock()
+_windows = defaultdict(lambda: deque(maxlen=WINDOW))
+# stage -> [count, total seconds] since the process started
+_totals = defaultdict(lambda: [0, 0.0])
+_prom_written = [0.0]
+_log_buffer = []
+_log_written = [time.time()]
+# Serializes the file writes, which happen outside _lock
+_file_lock = threading.Lock()
+
+
+def begin():
+    """Start a new collection for this thread (a rerun of the app); returns the list."""
+    _local.records = []
+    return _local.records
+
+
+@contextmanager
+def collect():
+    """Gather the measurements made by this thread; yields the list."""
+    previous = getattr(_local, 'records', None)
+    _local.records = []
+    try:
+        yield _local.records
+    finally:
+        _local.records = previous
+
+
+@contextmanager
+def timer(stage, rows=None):
+    """Time the block; set record['rows'] inside it if the count is only known there."""
+    record = {'stage': stage, 'rows': rows}
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record['seconds'] = time.perf_counter() - start
+        record['time'] = time.time()
+        _record(record)
+
+
+def _record(record):
+    records = getattr(_local, 'records', None)
+    if records is not None:
+        records.append(record)
+    lines, prom = None, None
+    now = time.time()
+    with _lock:
+        _windows[record['stage']].append(record['seconds'])
+        totals = _totals[record['stage']]
+        totals[0] += 1
+        totals[1] += record['seconds']
+        if METRICS_LOG is not None:
+            _log_buffer.append(record)
+            if len(_log_buffer) >= LOG_BATCH or now - _log_written[0] > LOG_INTERVAL:
+                lines = ''.join(json.dumps(r) + '\n' for r in _log_buffer)
+                del _log_buffer[:]
+                _log_written[0] = now
+        if METRICS_PROM is not None and now - _prom_written[0] > PROM_INTERVAL:
+            _prom_written[0] = now
+            prom = _prometheus_text()
+    if lines is not None or prom is not None:
+        with _file_lock:
+            if lines is not None:
+                _append_log(lines)
+            if prom is not None:
+                with open(METRICS_PROM + '.tmp', 'w') as f:
+                    f.write(prom)
+                os.replace(METRICS_PROM + '.tmp', METRICS_PROM)
+
+
+def _append_log(lines):
+    os.makedirs(os.path.dirname(METRICS_LOG) or '.', exist_ok=True)
+    with open(METRICS_LOG, 'a') as f:
+        f.write(lines)
+
+
+@atexit.register
+def flush():
+    """Append the buffered records to the JSON lines log."""
+    with _lock:
+        lines = ''.join(json.dumps(r) + '\n' for r in _log_buffer)
+        del _log_buffer[:]
+        _log_written[0] = time.time()
+    if lines and METRICS_LOG is not None:
+        with _file_lock:
+            _append_log(lines)
+
+
+def _quantile(values, q):
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+def summary():
+    """Rolling percentiles of every stage, across all sessions."""
+    with _lock:
+        rows = []
+        for stage, window in sorted(_windows.items()):
+            row = {'stage': stage, 'count': _totals[stage][0]}
+            for q in QUANTILES:
+                row['p%d (ms)' % (q * 100)] = round(_quantile(window, q) * 1000, 2)
+            rows.append(row)
+        return rows
+
+
+def _prometheus_text():
+    lines = [
+        '# HELP sadgrs_stage_seconds Duration of each stage of the app.',
+        '# TYPE sadgrs_stage_seconds summary',
+    ]
+    for stage, window in sorted(_windows.items()):
+        for q in QUANTILES:
+            lines.append('sadgrs_stage_seconds{stage="%s",quantile="%s"} %.6f' % (stage, q, _quantile(window, q)))
+        lines.append('sadgrs_stage_seconds_sum{stage="%s"} %.6f' % (stage, _totals[stage][1]))
+        lines.append('sadgrs_stage_seconds_count{stage="%s"} %d' % (stage, _totals[stage][0]))
+    return '\n'.join(lines) + '\n'
+
+
+def prometheus_text():
+    with _lock:
+        return _prometheus_text()
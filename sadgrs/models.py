@@ -0,0 +1,91 @@
+"""Process-wide registry of the classifiers stored in ./models/.
+
+Streamlit re-executes home.py on every interaction, but imported modules live
+for the whole server process, so a registry kept at module level is shared by
+every session. Models are unpickled once and kept warm in the shared resource
+cache (see sadgrs.resources), sized by their pickled files; an entry is
+reloaded only when the file on disk changes (mtime/size first, content hash
+to confirm).
+"""
+import os
+import pickle
+import hashlib
+import threading
+
+from sadgrs import metrics, resources
+
+MODELS_DIR = './models/'
+
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    def __init__(self, dir_path=MODELS_DIR, cache=None):
+        self.dir_path = dir_path
+        self.cache = cache or resources.cache
+        self._lock = threading.Lock()
+        self._listing = None
+        self._listing_mtime = None
+
+    def path(self, name):
+        return os.path.join(self.dir_path, name)
+
+    def list_models(self):
+        """Model file names, rescanned only when the directory changes."""
+        mtime = os.stat(self.dir_path).st_mtime_ns
+        with self._lock:
+            if self._listing is None or mtime != self._listing_mtime:
+                self._listing = sorted(
+                    name for name in os.listdir(self.dir_path)
+                    if not name.startswith('.') and os.path.isfile(self.path(name))
+                )
+                self._listing_mtime = mtime
+            return list(self._listing)
+
+    def _entry(self, name):
+        path = self.path(name)
+        stat = os.stat(path)
+
+        def unchanged(entry):
+            # Touched on disk: only reload if the content really changed
+            return entry['size'] == stat.st_size and entry['sha256'] == file_sha256(path)
+        return self.cache.get(
+            ('modelo', path), lambda: self._read(path, stat), signature=(stat.st_mtime_ns, stat.st_size),
+            nbytes=stat.st_size, fresh=unchanged,
+        )
+
+    def load(self, name):
+        """Return the unpickled model, reusing the warm copy when it is current."""
+        return self._entry(name)['model']
+
+    def sha256(self, name):
+        """Content hash of a model file (loads it if needed)."""
+        return self._entry(name)['sha256']
+
+    def invalidate(self, name=None):
+        if name is None:
+            self.cache.invalidate(kind='modelo')
+            with self._lock:
+                self._listing = None
+        else:
+            self.cache.invalidate(('modelo', self.path(name)))
+
+    def _read(self, path, stat):
+        with metrics.timer('model_load'):
+            with open(path, 'rb') as f:
+                raw = f.read()
+            model = pickle.loads(raw)
+        return {
+            'model': model,
+            'size': stat.st_size,
+            'sha256': hashlib.sha256(raw).hexdigest(),
+        }
+
+
+registry = ModelRegistry()
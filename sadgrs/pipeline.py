@@ -0,0 +1,180 @@
+"""Predict-and-aggregate pipeline shared by the app and the batch tools."""
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from sadgrs import stats, metrics, bootstrap, breakpoints
+from sadgrs.models import registry
+from sadgrs.cache import cache_key, predictions
+from sadgrs.ingest import ingest, load_column
+from sadgrs.aggregate import class_counts, aggregate
+
+# Distinct IPTU values classified per call
+CHUNK_SIZE = 65536
+# Households deduplicated per task
+BLOCK_SIZE = int(os.environ.get('SADGRS_BLOCK_SIZE', 262144))
+# Distinct values merged across blocks before they are classified
+MERGE_SIZE = int(os.environ.get('SADGRS_MERGE_SIZE', 262144))
+# Threads deduplicating blocks and classifying chunks of distinct values
+PARALLEL_WORKERS = int(os.environ.get('SADGRS_PARALLEL_WORKERS', os.cpu_count() or 1))
+
+
+def predict_classes(model, iptu):
+    import pandas as pd
+
+    # The models were fitted on a DataFrame with a single IPTU column
+    return model.predict(pd.DataFrame({'IPTU': np.asarray(iptu)}))
+
+
+def _count_block(bloco, decimals, table):
+    """Households per table interval and distinct values (with counts) left for the model."""
+    bloco = np.asarray(bloco)
+    if decimals is not None:
+        bloco = np.round(bloco, decimals)
+    por_intervalo = None
+    if table is not None:
+        dentro = (bloco >= table['lo']) & (bloco <= table['hi'])
+        posicoes = np.searchsorted(table['edges'], bloco[dentro], side='right')
+        por_intervalo = np.bincount(posicoes, minlength=len(table['labels']))
+        bloco = bloco[~dentro]
+    valores, multiplicidade = np.unique(bloco, return_counts=True)
+    return por_intervalo, valores, multiplicidade
+
+
+def _classify(model, valores, multiplicidade, classes):
+    return class_counts(predict_classes(model, valores), classes, weights=multiplicidade)
+
+
+def count_classes(model, iptu, classes, decimals=None, progress=None, chunk_size=CHUNK_SIZE, table=None,
+                  workers=PARALLEL_WORKERS, block_size=BLOCK_SIZE, merge_size=MERGE_SIZE):
+    """Households per class (aligned with `classes`) for an IPTU array.
+
+    IPTU values repeat a lot within a municipality, so each distinct value is
+    classified once and weighted by how many households share it; the counts
+    are identical to classifying every household. `decimals` optionally
+    quantizes the values first to merge near-duplicates. With a compiled
+    breakpoint `table` (see sadgrs.breakpoints) the values in its range are
+    classified by searchsorted and only the rest use the model.
+
+    The array is read in views of `block_size` households, deduplicated (and
+    looked up in the table) on up to `workers` threads, a few blocks ahead at
+    most. The (value, count) pairs of the blocks are merged into one set of
+    distinct values; when it grows beyond `merge_size` it is classified by the
+    model in the same pool, in calls of `chunk_size` values, and a new set is
+    started. Memory is thus bounded by the block and merge sizes rather than
+    by the file size, at the cost of classifying again the values that come
+    back after their set was classified. `progress(fraction)` is called after
+    each block.
+    """
+    qntd_clas = np.zeros(len(classes), dtype=np.int64)
+    intervalos = np.zeros(len(table['labels']), dtype=np.int64) if table is not None else None
+    pendentes = []
+    classificando = []
+    n = len(iptu)
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        def merge(final=False):
+            """Merge the pending pairs; classify them at the end or past merge_size."""
+            if not pendentes:
+                return 0
+            valores, inverso = np.unique(np.concatenate([v for v, _ in pendentes]), return_inverse=True)
+            pesos = np.bincount(inverso.ravel(), weights=np.concatenate([c for _, c in pendentes]))
+            del pendentes[:]
+            if not final and len(valores) <= merge_size:
+                pendentes.append((valores, pesos))
+                return len(valores)
+            for start in range(0, len(valores), chunk_size):
+                classificando.append(executor.submit(
+                    _classify, model, valores[start:start + chunk_size], pesos[start:start + chunk_size], classes,
+                ))
+            return 0
+
+        inicios = iter(range(0, n, block_size))
+        blocos = deque()
+
+        def submit():
+            start = next(inicios, None)
+            if start is not None:
+                bloco = iptu[start:start + block_size]
+                blocos.append((len(bloco), executor.submit(_count_block, bloco, decimals, table)))
+
+        for _ in range(2 * max(workers, 1)):
+            submit()
+        # Pairs in the merged set and pairs added since it was merged
+        feitos, mesclados, pendente = 0, 0, 0
+        while blocos:
+            tamanho, future = blocos.popleft()
+            por_intervalo, valores, multiplicidade = future.result()
+            submit()
+            if por_intervalo is not None:
+                intervalos += por_intervalo
+            pendentes.append((valores, multiplicidade))
+            pendente += len(valores)
+            # Merged once the new pairs outnumber the set, so merging stays O(n log n)
+            if pendente >= max(mesclados, chunk_size):
+                mesclados = merge()
+                pendente = 0
+            feitos += tamanho
+            if progress is not None:
+                progress(feitos / n)
+        merge(final=True)
+        for future in classificando:
+            qntd_clas += future.result()
+    if table is not None:
+        qntd_clas += class_counts(table['labels'], classes, weights=intervalos)
+    if progress is not None:
+        progress(1.0)
+    return qntd_clas
+
+
+def estimate_key(model_name, digest):
+    estatisticas = stats.load(model_name)
+    if estatisticas is None:
+        raise LookupError('O modelo %s não possui estatísticas das classes' % model_name)
+    return cache_key(
+        registry.sha256(model_name), estatisticas['meta']['versao'], digest,
+        bootstrap.METHOD, bootstrap.REPLICATES, bootstrap.LEVEL, bootstrap.SEED,
+    )
+
+
+def estimate(model_name, digest, progress=None, workers=None):
+    """Class counts and material estimates for an ingested IPTU file.
+
+    Results are cached by model hash, statistics version, dataset hash and
+    the interval method and parameters (replicates, level, seed). `workers`
+    is the number of classification threads (PARALLEL_WORKERS by default).
+    """
+    key = estimate_key(model_name, digest)
+    resultado = predictions.get(key)
+    if resultado is None:
+        estatisticas = stats.load(model_name)
+        iptu = load_column(digest)
+        model = registry.load(model_name)
+        with metrics.timer('predict', rows=len(iptu)):
+            qntd_clas = count_classes(
+                model, iptu, estatisticas['classes'].tolist(), progress=progress, table=breakpoints.load(model_name),
+                workers=PARALLEL_WORKERS if workers is None else workers,
+            )
+        with metrics.timer('aggregate'):
+            resultado = aggregate(qntd_clas, estatisticas['media'], estatisticas['media_emb'])
+        with metrics.timer('bootstrap'):
+            resultado.update(bootstrap.intervals(
+                qntd_clas, estatisticas, replicates=bootstrap.REPLICATES, level=bootstrap.LEVEL, seed=bootstrap.SEED,
+            ))
+        resultado['qntd_dom'] = len(iptu)
+        resultado = predictions.put(key, resultado)
+    resultado = dict(resultado)
+    resultado['qntd_dom'] = int(resultado['qntd_dom'])
+    resultado['total_inferior'] = float(resultado['total_inferior'])
+    resultado['total_superior'] = float(resultado['total_superior'])
+    return resultado
+
+
+def estimate_job(job, model_name, source):
+    """Background job (see sadgrs.jobs) running ingest and estimate for an upload."""
+    job.report(0, 'Carregando dados...')
+    digest = ingest(source)
+    job.report(0.2, 'Classificando domicílios...')
+    return estimate(model_name, digest, progress=lambda fraction: job.report(0.2 + 0.8 * fraction))
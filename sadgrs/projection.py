@@ -0,0 +1,111 @@
+"""Projections of the predicted daily generation for the "Visualização" page.
+
+The whole grid of generation types, periods and units is computed with one
+broadcasted array operation over the material vector, so the page only has
+to index into it when a selectbox changes. Multi-year projections for
+landfill planning (project_years) are computed the same way over
+municipalities, growth scenarios and years.
+"""
+import numpy as np
+
+from sadgrs.aggregate import N_RECICLAVEIS
+
+TIPOS = ['Domiciliar', 'Por pessoa']
+TEMPOS = ['Dia', 'Mês', 'Ano']
+DIAS = np.array([1.0, 30.0, 365.0])
+MEDIDAS = ['Tonelada (t)', 'Quilograma (kg)', 'Grama (g)']
+UNIDADES = ['t', 'kg', 'g']
+DIVISORES = np.array([1000000.0, 1000.0, 1.0])
+GRUPOS = ['Recicláveis', 'Não-recicláveis', 'Total (Não-recicláveis + recicláveis)']
+FATIAS = [slice(0, N_RECICLAVEIS), slice(N_RECICLAVEIS, None), slice(None)]
+# Range of the compaction density (t/m³) and persons per household sliders
+DENSIDADES = np.round(np.arange(0.60, 0.805, 0.01), 2)
+PESSOAS = np.arange(1, 11)
+
+
+def projection_grid(materiais, qntd_dom, media_pessoa):
+    """Projected generation of every material and material group.
+
+    `materiais` is the daily generation per material (g/day) for all
+    households. Returns a dict with
+
+        materiais  (tipo, tempo, medida, material)
+        totais     (tipo, tempo, medida, grupo)
+
+    indexed like TIPOS, TEMPOS, MEDIDAS and GRUPOS. Missing materials (NaN)
+    are left out of the group totals.
+    """
+    materiais = np.asarray(materiais, dtype=float)
+    escala_tipo = np.array([1.0, 1.0 / (qntd_dom * media_pessoa)])
+    escala = escala_tipo[:, None, None] * DIAS[None, :, None] / DIVISORES[None, None, :]
+    grid = escala[..., None] * materiais
+    totais = np.stack([np.nansum(grid[..., fatia], axis=-1) for fatia in FATIAS], axis=-1)
+    return {'materiais': grid, 'totais': totais}
+
+def sweep(materiais, qntd_dom, densidades=DENSIDADES, pessoas=PESSOAS):
+    """Response surfaces over compaction density and persons per household.
+
+    Computed in one pass for every period and material group, so the
+    sliders of the page only index into them. Returns a dict with
+
+        toneladas          (tempo, grupo)                       t, all households
+        volume             (tempo, grupo, densidade)            m³ of landfill
+        per_capita         (tempo, grupo, pessoas)              kg per person
+        volume_per_capita  (tempo, grupo, pessoas, densidade)   litres per person
+    """
+    toneladas = projection_grid(materiais, qntd_dom, 1)['totais'][0, :, MEDIDAS.index('Tonelada (t)'), :]
+    densidades = np.asarray(densidades, dtype=float)
+    por_pessoa = toneladas[..., None] / (qntd_dom * np.asarray(pessoas, dtype=float))
+    return {
+        'toneladas': toneladas,
+        'volume': toneladas[..., None] / densidades,
+        'per_capita': por_pessoa * 1000,
+        'volume_per_capita': por_pessoa[..., None] / densidades * 1000,
+    }
+
+
+def density_index(densidade, densidades=DENSIDADES):
+    return int(np.abs(np.asarray(densidades) - densidade).argmin())
+
+
+# Annual growth of households and population (%) of the default scenarios
+CENARIOS = {'Baixo': (0.5, 0.3), 'Médio': (1.0, 0.7), 'Alto': (1.5, 1.2)}
+# Household generation grows with persons per household to this power
+ELASTICIDADE = 1.0
+
+
+def project_years(materiais, crescimento_dom, crescimento_pop, anos=20, densidade=0.7, elasticidade=ELASTICIDADE):
+    """Yearly and cumulative tonnage and landfill volume of the material groups.
+
+    `materiais` is the daily generation per material (g/day), one row per
+    municipality (or a single vector). `crescimento_dom` and
+    `crescimento_pop` are annual growth rates (0.01 = 1%) with one entry per
+    scenario, or (municipalities x scenarios). Households grow at their rate
+    and the generation of each household follows the persons per household
+    raised to `elasticidade`. `densidade` is the compaction density (t/m³),
+    a scalar or one value per year. Returns a dict with
+
+        anos                  1..anos
+        toneladas             (municipality, scenario, year, grupo) t/year
+        toneladas_acumuladas  same shape, running total
+        volume                m³/year
+        volume_acumulado      m³, running total
+
+    Every municipality and scenario is computed in one broadcasted pass.
+    """
+    materiais = np.atleast_2d(np.asarray(materiais, dtype=float))
+    grupos = np.stack([np.nansum(materiais[:, fatia], axis=1) for fatia in FATIAS], axis=-1) * 365 / 1000000
+    t = np.arange(anos)
+    dom = 1 + np.asarray(crescimento_dom, dtype=float)[..., None]
+    pop = 1 + np.asarray(crescimento_pop, dtype=float)[..., None]
+    fator = dom ** t * (pop / dom) ** (t * elasticidade)
+    toneladas = grupos[:, None, None, :] * fator[..., None]
+    densidade = np.broadcast_to(np.asarray(densidade, dtype=float), (anos,))
+    volume = toneladas / densidade[:, None]
+    return {
+        'anos': t + 1,
+        'toneladas': toneladas,
+        'toneladas_acumuladas': np.cumsum(toneladas, axis=2),
+        'volume': volume,
+        'volume_acumulado': np.cumsum(volume, axis=2),
+    }
@@ -0,0 +1,140 @@
+"""PDF reports of the predicted waste generation, one per municipality.
+
+Reads the consolidated table written by sadgrs.batch and renders, for each
+municipality, the per-material estimates, confidence intervals, monthly and
+yearly projections and the composition pie chart. Reports are built in a
+process pool and each one is written straight to disk. Pie charts are drawn
+with Pillow and stored by content hash, so identical charts are drawn once
+and reused by every report that needs them.
+
+Usage:
+    python -m sadgrs.report resultado_ms.csv --out ./relatorios/
+"""
+import os
+import sys
+import hashlib
+import argparse
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from sadgrs.aggregate import MATERIAIS, CORES
+from sadgrs.projection import projection_grid
+
+CHART_SIZE = 480
+
+
+def _br(valor, casas=2):
+    if np.isnan(valor):
+        return '-'
+    return f'{valor:,.{casas}f}'.replace(',', 'X').replace('.', ',').replace('X', '.')
+
+
+def _rgb(cor):
+    cor = cor.lstrip('#')
+    return tuple(int(cor[i:i + 2], 16) for i in (0, 2, 4))
+
+
+def _file_name(municipio):
+    name = unicodedata.normalize('NFKD', municipio)
+    name = ''.join(c for c in name if not unicodedata.combining(c))
+    return name.replace(' ', '_') + '.pdf'
+
+
+def pie_chart(proporcao, chart_dir):
+    """Path of the pie chart for these proportions, drawing it only once."""
+    from PIL import Image, ImageDraw
+
+    proporcao = np.nan_to_num(np.asarray(proporcao, dtype=float))
+    proporcao = np.round(proporcao / proporcao.sum(), 4)
+    path = os.path.join(chart_dir, hashlib.sha1(proporcao.tobytes()).hexdigest()[:16] + '.png')
+    if os.path.exists(path):
+        return path
+
+    image = Image.new('RGB', (CHART_SIZE, CHART_SIZE), 'white')
+    draw = ImageDraw.Draw(image)
+    inicio = -90.0
+    for fracao, cor in zip(proporcao, CORES):
+        fim = inicio + 360.0 * fracao
+        if fim > inicio:
+            draw.pieslice([10, 10, CHART_SIZE - 10, CHART_SIZE - 10], inicio, fim, fill=cor)
+        inicio = fim
+    os.makedirs(chart_dir, exist_ok=True)
+    tmp = '%s.%d.tmp' % (path, os.getpid())
+    image.save(tmp, format='PNG')
+    os.replace(tmp, path)
+    return path
+
+
+def render(row, out_dir, chart_dir):
+    """Write the report of one municipality (a row of the batch table)."""
+    from fpdf import FPDF
+
+    totais = np.array([row[m + ' (g/dia)'] for m in MATERIAIS], dtype=float)
+    inferior = np.array([row[m + ' inf. (g/dia)'] for m in MATERIAIS], dtype=float)
+    superior = np.array([row[m + ' sup. (g/dia)'] for m in MATERIAIS], dtype=float)
+    domicilios = int(row['domicilios'])
+    # Household generation in tonnes for day / month / year
+    periodos = projection_grid(totais, domicilios, 1)['materiais'][0, :, 0, :]
+
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font('Arial', 'B', 16)
+    pdf.cell(0, 10, 'SAD GRS - Estimativa da geração de resíduos', ln=1)
+    pdf.set_font('Arial', '', 12)
+    pdf.cell(0, 8, 'Município: %s' % row['municipio'], ln=1)
+    pdf.cell(0, 8, 'Total de domicílios: %s' % _br(domicilios, 0), ln=1)
+    pdf.cell(0, 8, 'Geração domiciliar: %s t/dia' % _br(np.nansum(totais) / 1000000), ln=1)
+    pdf.ln(4)
+
+    larguras = (50, 28, 44, 34, 34)
+    pdf.set_font('Arial', 'B', 10)
+    for largura, titulo in zip(larguras, ('Material', 't/dia', 'Intervalo (t/dia)', 't/mês', 't/ano')):
+        pdf.cell(largura, 7, titulo, border=1, align='C')
+    pdf.ln()
+    pdf.set_font('Arial', '', 10)
+    for i, material in enumerate(MATERIAIS):
+        pdf.set_fill_color(*_rgb(CORES[i]))
+        pdf.cell(4, 7, '', border=1, fill=True)
+        pdf.cell(larguras[0] - 4, 7, material, border=1)
+        pdf.cell(larguras[1], 7, _br(periodos[0, i]), border=1, align='R')
+        intervalo = '%s - %s' % (_br(inferior[i] / 1000000), _br(superior[i] / 1000000))
+        pdf.cell(larguras[2], 7, intervalo, border=1, align='R')
+        pdf.cell(larguras[3], 7, _br(periodos[1, i]), border=1, align='R')
+        pdf.cell(larguras[4], 7, _br(periodos[2, i]), border=1, align='R')
+        pdf.ln()
+    pdf.ln(6)
+
+    pdf.set_font('Arial', 'B', 12)
+    pdf.cell(0, 8, 'Proporção dos resíduos sólidos', ln=1)
+    pdf.image(pie_chart(totais, chart_dir), x=55, w=100)
+
+    path = os.path.join(out_dir, _file_name(row['municipio']))
+    pdf.output(path, 'F')
+    return path
+
+
+def main():
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description='Relatórios em PDF a partir do resultado em lote')
+    parser.add_argument('table', help='tabela gerada por python -m sadgrs.batch')
+    parser.add_argument('--out', default='./relatorios/')
+    parser.add_argument('--workers', type=int, default=None, help='processos (padrão: núcleos da CPU)')
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    chart_dir = os.path.join(args.out, 'graficos')
+    rows = pd.read_csv(args.table).to_dict('records')
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(render, row, args.out, chart_dir): row['municipio'] for row in rows}
+        for future in as_completed(futures):
+            try:
+                print(future.result())
+            except Exception as e:
+                print('Falha em %s: %s' % (futures[future], e), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
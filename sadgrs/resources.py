@@ -0,0 +1,147 @@
+"""Process-wide cache of the read-only resources shared by every session.
+
+Models, class statistics, compiled breakpoint tables, ingested IPTU columns
+and reference data such as the municipality list are loaded once per server
+process and every session gets the same copy. Cached copies are made
+immutable (read-only arrays, tuples, read-only mappings) so no session can
+change what the others see; models cannot be frozen and must be treated the
+same way. Each entry records its size, and the least recently used entries
+are evicted when the total exceeds the budget. Memory-mapped arrays live in
+the OS page cache, which is shared by every process, so they count as zero.
+"""
+import os
+import json
+import pickle
+import threading
+from types import MappingProxyType
+from collections import OrderedDict
+
+RESOURCE_BUDGET = int(os.environ.get('SADGRS_RESOURCE_BUDGET_MB', 1024)) * 1024 * 1024
+CIDADES_PATH = './data/cidades_ms.json'
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    if hasattr(value, 'setflags'):
+        value.setflags(write=False)
+    return value
+
+
+def _nbytes(value):
+    if isinstance(value, (dict, MappingProxyType)):
+        return sum(_nbytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(_nbytes(v) for v in value)
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if hasattr(value, 'nbytes'):
+        return 0 if getattr(value, 'filename', None) is not None else int(value.nbytes)
+    if isinstance(value, (int, float, bool)) or value is None:
+        return 8
+    return len(pickle.dumps(value))
+
+
+class ResourceCache:
+    def __init__(self, budget=RESOURCE_BUDGET):
+        self.budget = budget
+        # Guards the bookkeeping only; loads run under the lock of their key
+        self._lock = threading.Lock()
+        # (kind, name) -> {'value', 'signature', 'nbytes', 'hits'}, in LRU order
+        self._entries = OrderedDict()
+        # (kind, name) -> lock held while that resource is being loaded
+        self._loading = {}
+
+    def get(self, key, loader, signature=None, nbytes=None, fresh=None):
+        """The shared copy of a resource, loading it with loader() when missing.
+
+        `key` is a (kind, name) pair. A copy stored with another `signature`
+        (e.g. the file mtime) is reloaded, unless fresh(value) confirms the
+        content did not change. `nbytes` overrides the measured size. A
+        resource is loaded by one thread at a time, without blocking the
+        sessions that need other resources.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry['signature'] == signature:
+                return self._hit(key, entry)
+            key_lock = self._loading.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                # Loaded by another thread while this one waited
+                entry = self._entries.get(key)
+                if entry is not None and entry['signature'] == signature:
+                    return self._hit(key, entry)
+            if entry is not None and fresh is not None and fresh(entry['value']):
+                with self._lock:
+                    # Put back in case it was evicted while being checked
+                    entry['signature'] = signature
+                    self._entries[key] = entry
+                    return self._hit(key, entry)
+            value = _freeze(loader())
+            entry = {
+                'value': value,
+                'signature': signature,
+                'nbytes': _nbytes(value) if nbytes is None else nbytes,
+                'hits': 0,
+            }
+            with self._lock:
+                self._entries[key] = entry
+                value = self._hit(key, entry)
+                self._evict(keep=key)
+                return value
+
+    def _hit(self, key, entry):
+        entry['hits'] += 1
+        self._entries.move_to_end(key)
+        return entry['value']
+
+    def invalidate(self, key=None, kind=None):
+        """Drop one entry, every entry of a kind, or everything."""
+        with self._lock:
+            if key is not None:
+                self._entries.pop(key, None)
+            else:
+                for k in [k for k in self._entries if kind is None or k[0] == kind]:
+                    del self._entries[k]
+
+    def memory_usage(self, kind=None):
+        with self._lock:
+            return self._usage(kind)
+
+    def _usage(self, kind=None):
+        return sum(e['nbytes'] for k, e in self._entries.items() if kind is None or k[0] == kind)
+
+    def report(self):
+        """One row per entry, largest first, for the diagnostics panel."""
+        with self._lock:
+            rows = [
+                {'Recurso': '%s: %s' % key, 'MB': round(e['nbytes'] / 1048576, 2), 'Acessos': e['hits']}
+                for key, e in self._entries.items()
+            ]
+        return sorted(rows, key=lambda row: row['MB'], reverse=True)
+
+    def _evict(self, keep):
+        # Drop least recently used entries, but never the one just requested
+        while self._usage() > self.budget and len(self._entries) > 1:
+            oldest = next(iter(self._entries))
+            if oldest == keep:
+                break
+            del self._entries[oldest]
+
+
+cache = ResourceCache()
+
+
+def load_json(path):
+    def loader():
+        with open(path, encoding='utf8') as f:
+            return json.load(f)
+    return cache.get(('json', path), loader, signature=os.stat(path).st_mtime_ns)
+
+
+def municipios(path=CIDADES_PATH):
+    """Names of the municipalities of Mato Grosso do Sul."""
+    return load_json(path)['cidades']
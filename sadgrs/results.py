@@ -0,0 +1,100 @@
+"""Per-session store for the output of the "Predições" page.
+
+Results are kept in memory as NumPy arrays, keyed by the Streamlit session
+id, so concurrent users never see each other's predictions. Entries idle for
+longer than the TTL are evicted; when a spill directory is configured they
+are written there first and transparently reloaded on the next access.
+"""
+import os
+import time
+import threading
+
+import numpy as np
+
+RESULTS_TTL = float(os.environ.get('SADGRS_RESULTS_TTL', 4 * 3600))
+SPILL_DIR = os.environ.get('SADGRS_RESULTS_SPILL', './data/sessions/') or None
+# Spilled results are kept on disk for this long
+SPILL_TTL = 24 * 3600
+
+
+def current_session_id():
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else 'local'
+
+
+class ResultStore:
+    def __init__(self, ttl=RESULTS_TTL, spill_dir=SPILL_DIR):
+        self.ttl = ttl
+        self.spill_dir = spill_dir
+        self._lock = threading.Lock()
+        # session id -> (last access, {name: ndarray})
+        self._entries = {}
+
+    def put(self, session_id, result):
+        result = {name: np.asarray(values) for name, values in result.items()}
+        with self._lock:
+            self._entries[session_id] = (time.monotonic(), result)
+        self.evict_expired()
+
+    def get(self, session_id):
+        self.evict_expired()
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                result = self._load_spill(session_id)
+                if result is None:
+                    return None
+            else:
+                result = entry[1]
+            self._entries[session_id] = (time.monotonic(), result)
+            return result
+
+    def discard(self, session_id):
+        with self._lock:
+            self._entries.pop(session_id, None)
+        path = self._spill_path(session_id)
+        if path is not None and os.path.exists(path):
+            os.remove(path)
+
+    def evict_expired(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [sid for sid, (seen, _) in self._entries.items() if now - seen > self.ttl]
+            evicted = [(sid, self._entries.pop(sid)[1]) for sid in expired]
+        for session_id, result in evicted:
+            self._spill(session_id, result)
+
+    def _spill_path(self, session_id):
+        if self.spill_dir is None:
+            return None
+        return os.path.join(self.spill_dir, '%s.npz' % session_id)
+
+    def _spill(self, session_id, result):
+        path = self._spill_path(session_id)
+        if path is None:
+            return
+        os.makedirs(self.spill_dir, exist_ok=True)
+        with open(path, 'wb') as f:
+            np.savez(f, **result)
+        self._clean_spill()
+
+    def _load_spill(self, session_id):
+        path = self._spill_path(session_id)
+        if path is None or not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            result = {name: data[name] for name in data.files}
+        os.remove(path)
+        return result
+
+    def _clean_spill(self):
+        limit = time.time() - SPILL_TTL
+        for name in os.listdir(self.spill_dir):
+            path = os.path.join(self.spill_dir, name)
+            if os.path.getmtime(path) < limit:
+                os.remove(path)
+
+
+store = ResultStore()
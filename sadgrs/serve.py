@@ -0,0 +1,25 @@
+"""Launcher that warms the server process up before the first session.
+
+Starts the warm-up and the readiness endpoint (see sadgrs.warmup) and then
+runs Streamlit on home.py in the same process, so the caches filled by the
+warm-up are the ones the sessions use and the readiness check answers from
+the moment the server starts.
+
+Usage (from the repository root, with any `streamlit run` options):
+    python -m sadgrs.serve --server.port 8501
+"""
+import sys
+
+from sadgrs import warmup
+
+
+def main():
+    warmup.start()
+    from streamlit.web import cli
+
+    sys.argv = ['streamlit', 'run', 'home.py'] + sys.argv[1:]
+    sys.exit(cli.main())
+
+
+if __name__ == '__main__':
+    main()
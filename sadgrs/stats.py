@@ -0,0 +1,211 @@
+"""Versioned class-statistics artifacts.
+
+Each model in ./models/ has its class statistics in a single uncompressed
+.npz file, ./models/stats/<model>.v<N>.npz, holding one row per class and one
+column per material:
+
+    classes    class labels predicted by the model
+    media      mean generation per household (g/day)
+    margem     margin of error of the mean (g/day)
+    media_emb  mean packaging / non-packaging proportions
+    meta       JSON with the format version, material order, units and the
+               sha256 of the model the statistics belong to
+
+Artifacts built from survey data also keep the running moments (n, m2 for
+the materials, n_emb for the packaging proportions), so new survey records
+can be folded in with streaming updates instead of recomputing everything
+from the full survey history, and the survey records themselves (amostras,
+records x materials, and rotulos, the class of each record) for the
+bootstrap intervals of sadgrs.bootstrap.
+
+Artifacts are never overwritten: a new version is written instead, so older
+predictions stay reproducible. Loaded artifacts are shared read-only by every
+session through sadgrs.resources.
+
+Usage (converts the legacy per-class pickles in ./data/):
+    python -m sadgrs.stats Classificacao.sav --classes 3
+"""
+import os
+import re
+import json
+import pickle
+import argparse
+import tempfile
+import warnings
+
+import numpy as np
+
+from sadgrs import metrics, resources
+from sadgrs.aggregate import MATERIAIS, EMBALAGENS
+from sadgrs.models import registry
+
+STATS_DIR = './models/stats/'
+FORMAT_VERSION = 1
+UNIDADES = 'g/domicílio/dia'
+# z for the 95% margin of error of the class means
+Z_95 = 1.96
+
+
+def _stem(model_name):
+    return os.path.splitext(os.path.basename(model_name))[0]
+
+
+def stats_path(model_name, version):
+    return os.path.join(STATS_DIR, '%s.v%d.npz' % (_stem(model_name), version))
+
+
+def versions(model_name):
+    if not os.path.isdir(STATS_DIR):
+        return []
+    pattern = re.compile(r'^%s\.v(\d+)\.npz$' % re.escape(_stem(model_name)))
+    found = (pattern.match(name) for name in os.listdir(STATS_DIR))
+    return sorted(int(m.group(1)) for m in found if m)
+
+
+def moments(values, labels, classes):
+    """Per-class (count, mean, sum of squared deviations), ignoring NaN."""
+    values = np.asarray(values, dtype=np.float64)
+    shape = (len(classes), values.shape[1])
+    n, mean, m2 = np.zeros(shape), np.full(shape, np.nan), np.zeros(shape)
+    for k, label in enumerate(classes):
+        grupo = values[np.asarray(labels) == label]
+        n[k] = np.sum(~np.isnan(grupo), axis=0)
+        with warnings.catch_warnings():
+            # Mean of an empty class or of an all-NaN material
+            warnings.simplefilter('ignore', RuntimeWarning)
+            mean[k] = np.nanmean(grupo, axis=0)
+        m2[k] = np.nansum((grupo - mean[k]) ** 2, axis=0)
+    return n, mean, m2
+
+
+def merge_moments(n_a, mean_a, m2_a, n_b, mean_b, m2_b):
+    """Combine two sets of moments (Chan et al. / Welford parallel update)."""
+    n = n_a + n_b
+    with np.errstate(invalid='ignore', divide='ignore'):
+        delta = np.nan_to_num(mean_b) - np.nan_to_num(mean_a)
+        mean = np.where(n > 0, np.nan_to_num(mean_a) + delta * n_b / n, np.nan)
+        m2 = m2_a + m2_b + np.where(n > 0, delta ** 2 * n_a * n_b / n, 0.0)
+    return n, mean, m2
+
+
+def margin(n, m2):
+    """95% margin of error of the mean; NaN with fewer than two records."""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(n > 1, Z_95 * np.sqrt(m2 / (n - 1)) / np.sqrt(n), np.nan)
+
+
+def save(model_name, classes, media, margem, media_emb, model_sha256=None, **arrays):
+    """Write the statistics as the next version of `model_name` and return it."""
+    media = np.asarray(media, dtype=np.float64)
+    if media.shape != (len(classes), len(MATERIAIS)):
+        raise ValueError('media deve ter uma linha por classe e uma coluna por material')
+    os.makedirs(STATS_DIR, exist_ok=True)
+    while True:
+        version = (versions(model_name) or [0])[-1] + 1
+        meta = {
+            'formato': FORMAT_VERSION,
+            'modelo': os.path.basename(model_name),
+            'modelo_sha256': model_sha256,
+            'versao': version,
+            'materiais': MATERIAIS,
+            'embalagens': EMBALAGENS,
+            'unidades': UNIDADES,
+        }
+        fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=STATS_DIR)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(
+                    f,
+                    classes=np.asarray(classes),
+                    media=media,
+                    margem=np.asarray(margem, dtype=np.float64),
+                    media_emb=np.asarray(media_emb, dtype=np.float64),
+                    meta=np.array(json.dumps(meta, ensure_ascii=False)),
+                    **arrays
+                )
+            # Claims the version atomically: fails if another writer took it
+            os.link(tmp, stats_path(model_name, version))
+            return version
+        except FileExistsError:
+            continue
+        finally:
+            os.remove(tmp)
+
+
+def load(model_name, version=None):
+    """Statistics of a model (latest version by default), or None if missing."""
+    if version is None:
+        found = versions(model_name)
+        if not found:
+            return None
+        version = found[-1]
+    path = stats_path(model_name, version)
+
+    def read():
+        with metrics.timer('stats_load'), np.load(path, allow_pickle=False) as data:
+            stats = {name: data[name] for name in data.files if name != 'meta'}
+            stats['meta'] = json.loads(str(data['meta']))
+        return stats
+    return resources.cache.get(('estatisticas', path), read, signature=os.stat(path).st_mtime_ns)
+
+
+def fold_in(model_name, materiais, emb, labels):
+    """Fold new survey records into the latest statistics; returns the new version.
+
+    `materiais` is (records x materials) in g/day, `emb` (records x 2) or
+    None and `labels` the class of each record. The previous versions are
+    kept untouched.
+    """
+    atual = load(model_name)
+    if atual is None:
+        raise LookupError('O modelo %s não possui estatísticas das classes' % model_name)
+    if 'm2' not in atual:
+        raise ValueError('As estatísticas de %s não guardam os momentos necessários para a atualização' % model_name)
+    classes = atual['classes'].tolist()
+
+    n, media, m2 = merge_moments(atual['n'], atual['media'], atual['m2'], *moments(materiais, labels, classes))
+    n_emb, media_emb = atual['n_emb'], atual['media_emb']
+    if emb is not None:
+        n_novo, media_nova, _ = moments(emb, labels, classes)
+        zeros = np.zeros_like(media_emb)
+        n_emb, media_emb, _ = merge_moments(n_emb, media_emb, zeros, n_novo, media_nova, zeros)
+    extra = {name: atual[name] for name in ('limites',) if name in atual}
+    if 'amostras' in atual:
+        extra['amostras'] = np.vstack([atual['amostras'], np.asarray(materiais, dtype=np.float64)])
+        extra['rotulos'] = np.concatenate([atual['rotulos'], np.asarray(labels)])
+    return save(
+        model_name, classes, media, margin(n, m2), media_emb,
+        model_sha256=atual['meta']['modelo_sha256'], n=n, m2=m2, n_emb=n_emb, **extra
+    )
+
+
+def convert_legacy(model_name, data_dir='./data/', n_classes=3, model_sha256=None):
+    """Build an artifact from the media_classe_k/margem_classe_k/media_emb_k pickles."""
+    classes = list(range(1, n_classes + 1))
+    tabelas = {}
+    for nome, colunas in (('media_classe', MATERIAIS), ('margem_classe', MATERIAIS), ('media_emb', EMBALAGENS)):
+        linhas = []
+        for k in classes:
+            with open(os.path.join(data_dir, '%s_%d.sav' % (nome, k)), 'rb') as f:
+                linhas.append(pickle.load(f)[colunas].to_numpy(dtype=float)[0])
+        tabelas[nome] = np.vstack(linhas)
+    return save(
+        model_name, classes, tabelas['media_classe'], tabelas['margem_classe'], tabelas['media_emb'],
+        model_sha256=model_sha256,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Converte as estatísticas legadas (.sav) de um modelo')
+    parser.add_argument('model', help='nome do arquivo do modelo em ./models/')
+    parser.add_argument('--data-dir', default='./data/')
+    parser.add_argument('--classes', type=int, default=3)
+    args = parser.parse_args()
+    version = convert_legacy(
+        args.model, args.data_dir, args.classes, model_sha256=registry.sha256(args.model),
+    )
+    print(stats_path(args.model, version))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+"""Training of new classifiers from household gravimetry surveys.
+
+The survey spreadsheet has one row per household with its IPTU, the daily
+generation of each material (g/day) and, optionally, the packaging
+proportions (P_Emb, P_N_Emb). Households are split into classes by quantiles
+of their total generation and an SVM learns to predict the class from IPTU.
+
+Every requested (classes, kernel) configuration is evaluated concurrently in
+a process pool. The survey data is sent once to each worker, and the
+train/test split and the scaled features are computed once per worker and
+reused by every configuration. Configurations are ranked by Cohen's kappa,
+which corrects the accuracy for chance agreement, so models with fewer
+classes are not favoured just for having fewer classes. Configurations that
+fail or do not finish within the time limit are dropped. The best one is
+refitted and written to ./models/ together with its class statistics (see
+sadgrs.stats). The model file name ends with the start of its sha256, so a
+retrained model never replaces one that statistics or cached predictions
+still refer to.
+"""
+import os
+import pickle
+import hashlib
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed, TimeoutError
+
+import numpy as np
+
+from sadgrs import stats
+from sadgrs.models import registry
+from sadgrs.aggregate import MATERIAIS, EMBALAGENS
+
+KERNELS = {'Linear': 'linear', 'RBF': 'rbf', 'Sigmoid': 'sigmoid'}
+SEED = 42
+# Bounds the time of a single fit, and of the whole search
+MAX_ITER = 100000
+TIMEOUT = float(os.environ.get('SADGRS_TRAINING_TIMEOUT', 600))
+
+# Survey data of the current worker process, set by _init_worker
+_data = {}
+
+
+def read_gravimetria(source):
+    import io
+    import pandas as pd
+
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    df = pd.read_excel(source)
+    missing = [c for c in ['IPTU'] + MATERIAIS if c not in df.columns]
+    if missing:
+        raise ValueError('Colunas ausentes na planilha de gravimetria: %s' % ', '.join(missing))
+    return df
+
+
+def label_classes(geracao, n_classes):
+    """Class 1..n of each household by quantiles of its total generation."""
+    limites = np.quantile(geracao, np.linspace(0, 1, n_classes + 1)[1:-1])
+    return np.searchsorted(limites, geracao, side='right') + 1, limites
+
+
+def class_statistics(materiais, emb, labels, n_classes):
+    """Arguments for stats.save: means, 95% margins, packaging proportions, moments and records."""
+    classes = list(range(1, n_classes + 1))
+    n, media, m2 = stats.moments(materiais, labels, classes)
+    artefato = {
+        'classes': classes, 'media': media, 'margem': stats.margin(n, m2), 'n': n, 'm2': m2,
+        'amostras': np.asarray(materiais, dtype=np.float64), 'rotulos': np.asarray(labels),
+    }
+    if emb is None:
+        artefato['media_emb'] = np.full((n_classes, len(EMBALAGENS)), np.nan)
+        artefato['n_emb'] = np.zeros((n_classes, len(EMBALAGENS)))
+    else:
+        artefato['n_emb'], artefato['media_emb'], _ = stats.moments(emb, labels, classes)
+    return artefato
+
+
+def _embalagens(df):
+    if all(c in df.columns for c in EMBALAGENS):
+        return df[EMBALAGENS].to_numpy(dtype=float)
+    return None
+
+
+def _init_worker(iptu, geracao, test_size, seed):
+    _data.update(iptu=iptu, geracao=geracao, test_size=test_size, seed=seed)
+
+
+@functools.lru_cache(maxsize=None)
+def _prepared():
+    """Train/test split and scaled features, shared by every configuration."""
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import StandardScaler
+
+    indices = np.arange(len(_data['iptu']))
+    treino, teste = train_test_split(indices, test_size=_data['test_size'], random_state=_data['seed'])
+    scaler = StandardScaler().fit(_data['iptu'][treino].reshape(-1, 1))
+    x = scaler.transform(_data['iptu'].reshape(-1, 1))
+    return treino, teste, x
+
+
+@functools.lru_cache(maxsize=None)
+def _labels(n_classes):
+    return label_classes(_data['geracao'], n_classes)[0]
+
+
+def _evaluate(n_classes, kernel):
+    from sklearn.svm import SVC
+    from sklearn.metrics import accuracy_score, cohen_kappa_score
+
+    treino, teste, x = _prepared()
+    y = _labels(n_classes)
+    clf = SVC(kernel=KERNELS[kernel], max_iter=MAX_ITER).fit(x[treino], y[treino])
+    previsto = clf.predict(x[teste])
+    return {
+        'classes': n_classes, 'kernel': kernel,
+        'acuracia': float(accuracy_score(y[teste], previsto)),
+        'kappa': float(cohen_kappa_score(y[teste], previsto)),
+    }
+
+
+def grid_search(df, classes_list, kernels, test_size, workers=None, timeout=TIMEOUT, progress=None):
+    """Scores of every (classes, kernel) configuration, best kappa first.
+
+    Configurations that failed come last, with the error instead of scores.
+    """
+    if any(k < 2 for k in classes_list):
+        raise ValueError('Os modelos precisam de pelo menos 2 classes')
+    iptu = df['IPTU'].to_numpy(dtype=float)
+    geracao = np.nansum(df[MATERIAIS].to_numpy(dtype=float), axis=1)
+    configs = [(k, kernel) for k in classes_list for kernel in kernels]
+    resultados, falhas = [], []
+    executor = ProcessPoolExecutor(
+        max_workers=min(workers or os.cpu_count() or 1, len(configs)),
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+        initargs=(iptu, geracao, test_size, SEED),
+    )
+    try:
+        futures = {executor.submit(_evaluate, *config): config for config in configs}
+        try:
+            for future in as_completed(futures, timeout=timeout):
+                try:
+                    resultados.append(future.result())
+                except Exception as e:
+                    # e.g. a class count the survey cannot split into distinct classes
+                    n_classes, kernel = futures[future]
+                    falhas.append({'classes': n_classes, 'kernel': kernel, 'erro': str(e)})
+                if progress is not None:
+                    progress((len(resultados) + len(falhas)) / len(configs))
+        except TimeoutError:
+            pass
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return sorted(resultados, key=lambda r: r['kappa'], reverse=True) + falhas
+
+
+def fit_final(df, n_classes, kernel):
+    """The winning configuration refitted on all the data, as an IPTU -> class pipeline."""
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.svm import SVC
+
+    geracao = np.nansum(df[MATERIAIS].to_numpy(dtype=float), axis=1)
+    y, limites = label_classes(geracao, n_classes)
+    model = make_pipeline(StandardScaler(), SVC(kernel=KERNELS[kernel], max_iter=MAX_ITER))
+    model.fit(df[['IPTU']], y)
+    return model, y, limites
+
+
+def save_model(df, model, y, limites, n_classes, kernel):
+    """Write the model to ./models/ and its class statistics to ./models/stats/.
+
+    Returns the model file name and the statistics version. Existing model
+    files are never overwritten: the name carries the content hash, so an
+    existing file with that name already holds this model.
+    """
+    raw = pickle.dumps(model)
+    sha256 = hashlib.sha256(raw).hexdigest()
+    model_name = 'SVM_%s_%d_classes_%s.sav' % (kernel, n_classes, sha256[:12])
+    path = registry.path(model_name)
+    with open(path + '.tmp', 'wb') as f:
+        f.write(raw)
+    try:
+        os.link(path + '.tmp', path)
+    except FileExistsError:
+        pass
+    finally:
+        os.remove(path + '.tmp')
+    registry.invalidate(model_name)
+
+    artefato = class_statistics(df[MATERIAIS].to_numpy(dtype=float), _embalagens(df), y, n_classes)
+    return model_name, stats.save(model_name, model_sha256=sha256, limites=limites, **artefato)
+
+
+def update_statistics(model_name, source):
+    """Fold a new gravimetry survey into the statistics of a model; returns the new version.
+
+    Records are assigned to classes with the generation limits the model was
+    trained with. Statistics converted from the legacy pickles have neither
+    the limits nor the moments needed to fold records in, and are rejected.
+    """
+    df = read_gravimetria(source)
+    atual = stats.load(model_name)
+    if atual is None:
+        raise LookupError('O modelo %s não possui estatísticas das classes' % model_name)
+    if 'limites' not in atual or 'm2' not in atual:
+        raise ValueError('As estatísticas de %s não guardam os momentos necessários para a atualização' % model_name)
+    materiais = df[MATERIAIS].to_numpy(dtype=float)
+    labels = np.searchsorted(atual['limites'], np.nansum(materiais, axis=1), side='right') + 1
+    return stats.fold_in(model_name, materiais, _embalagens(df), labels)
+
+
+def training_job(job, source, classes_list, kernels, test_size):
+    """Background job (see sadgrs.jobs): grid search, then save the best model."""
+    job.report(0, 'Lendo dados de gravimetria...')
+    df = read_gravimetria(source)
+    job.report(0.05, 'Avaliando configurações...')
+    resultados = grid_search(
+        df, classes_list, kernels, test_size, progress=lambda fraction: job.report(0.05 + 0.85 * fraction),
+    )
+    if not resultados:
+        raise TimeoutError('Nenhuma configuração terminou dentro do tempo limite')
+    if 'erro' in resultados[0]:
+        erros = '; '.join('%d classes, %s: %s' % (r['classes'], r['kernel'], r['erro']) for r in resultados)
+        raise RuntimeError('Nenhuma configuração foi avaliada com sucesso: ' + erros)
+    melhor = resultados[0]
+    job.report(0.9, 'Treinando o melhor modelo...')
+    model, y, limites = fit_final(df, melhor['classes'], melhor['kernel'])
+    model_name, versao = save_model(df, model, y, limites, melhor['classes'], melhor['kernel'])
+    job.report(1.0)
+    return {'modelo': model_name, 'versao': versao, 'resultados': resultados}
@@ -0,0 +1,138 @@
+"""Warm-up of a fresh server process.
+
+Loads every model in ./models/ with its class statistics and breakpoint
+table, the municipality list and the default Campo Grande dataset, then runs
+a prediction of the default dataset with each model so the result is already
+cached when the first planner asks for it. `start` runs it once per process
+in a background thread.
+
+Streamlit only runs home.py when the first session connects, so the
+warm-up is started by sadgrs.serve, in the server process before Streamlit
+begins listening. `streamlit run home.py` does not warm up, so the first
+page of a plain server (and benchmarks/startup.py) does not compete with it.
+
+Readiness is exposed as `ready` (a threading.Event), as a marker file
+(SADGRS_READY_FILE) holding the pid of the server that finished warming up
+and, when SADGRS_READY_PORT is set, as an HTTP endpoint answering 200 once
+warm and 503 before, for the load balancer health checks. `start` removes a
+marker left by an earlier process, and a marker that cannot be written is
+reported in `status` without holding back `ready`.
+
+Running the module on its own only fills the on-disk caches (ingested
+columns, predictions); it does not touch the readiness marker:
+    python -m sadgrs.warmup
+"""
+import os
+import sys
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_IPTU = './data/IPTU_MEDIO_RESIDENCIAL_CG.xlsx'
+READY_FILE = os.environ.get('SADGRS_READY_FILE', './data/.ready')
+READY_PORT = os.environ.get('SADGRS_READY_PORT')
+
+ready = threading.Event()
+# Steps done so far and the errors that did not stop the warm-up
+status = {'etapas': [], 'erros': [], 'segundos': None}
+_started = threading.Lock()
+_thread = None
+
+
+def _step(name, fn, *args):
+    try:
+        fn(*args)
+        status['etapas'].append(name)
+    except Exception as e:
+        status['erros'].append('%s: %s' % (name, e))
+
+
+def _warm_up():
+    from sadgrs import stats, resources, breakpoints
+    from sadgrs.models import registry
+    from sadgrs.ingest import ingest, load_column
+    from sadgrs.pipeline import estimate
+
+    _step('municípios', resources.municipios)
+    models = registry.list_models()
+    for name in models:
+        _step('modelo %s' % name, registry.load, name)
+        _step('estatísticas %s' % name, stats.load, name)
+        _step('pontos de corte %s' % name, breakpoints.load, name)
+    if os.path.exists(DEFAULT_IPTU):
+        digest = []
+        _step('dados padrão', lambda: digest.append(ingest(DEFAULT_IPTU)))
+        if digest:
+            _step('colunas padrão', load_column, digest[0])
+            # A full prediction per model also warms pandas, sklearn and the prediction cache
+            for name in models:
+                if stats.load(name) is not None:
+                    _step('predição %s' % name, estimate, name, digest[0])
+
+
+def warm_up(mark_ready=True):
+    """Run every step; the process is flagged ready even if some of them failed."""
+    start = time.perf_counter()
+    try:
+        _step('aquecimento', _warm_up)
+    finally:
+        status['segundos'] = time.perf_counter() - start
+        if mark_ready:
+            ready.set()
+            if READY_FILE:
+                _step('marcador de prontidão', _write_ready_file)
+
+
+def _write_ready_file():
+    with open(READY_FILE + '.tmp', 'w') as f:
+        f.write('%d\n' % os.getpid())
+    os.replace(READY_FILE + '.tmp', READY_FILE)
+
+
+class _ReadyHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        code = 200 if ready.is_set() else 503
+        self.send_response(code)
+        self.send_header('Content-Type', 'text/plain')
+        self.end_headers()
+        self.wfile.write(b'ok\n' if code == 200 else b'warming up\n')
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _serve_readiness(port):
+    server = ThreadingHTTPServer(('', port), _ReadyHandler)
+    threading.Thread(target=server.serve_forever, name='sadgrs-ready', daemon=True).start()
+
+
+def start():
+    """Start the warm-up in background; later calls do nothing."""
+    global _thread
+    if not _started.acquire(blocking=False):
+        return
+    if READY_FILE:
+        # Left by an earlier process, it does not say this one is warm
+        try:
+            os.remove(READY_FILE)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            status['erros'].append('marcador de prontidão: %s' % e)
+    if READY_PORT:
+        _serve_readiness(int(READY_PORT))
+    _thread = threading.Thread(target=warm_up, name='sadgrs-warmup', daemon=True)
+    _thread.start()
+
+
+def main():
+    warm_up(mark_ready=False)
+    for etapa in status['etapas']:
+        print(etapa)
+    for erro in status['erros']:
+        print('Falha em %s' % erro, file=sys.stderr)
+    print('Aquecimento concluído em %.1f s' % status['segundos'])
+
+
+if __name__ == '__main__':
+    main()
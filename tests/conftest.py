@@ -0,0 +1,30 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Run from the repository root, like the app and the benchmarks
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class ThresholdModel:
+    """Three IPTU bands; a value equal to a cut already belongs to the next band."""
+    classes_ = np.array([1, 2, 3])
+    cortes = [600.0, 1500.0]
+
+    def predict(self, X):
+        return np.searchsorted(self.cortes, np.asarray(X, dtype=float).ravel(), side='right') + 1
+
+
+@pytest.fixture
+def model():
+    return ThresholdModel()
+
+
+@pytest.fixture
+def iptu():
+    # Log-normal and heavily repeated, like the real IPTU columns
+    rng = np.random.default_rng(0)
+    valores = np.round(rng.lognormal(6.7, 0.8, size=500), 2)
+    return np.concatenate([rng.choice(valores, size=20000), ThresholdModel.cortes]).astype(np.float32)
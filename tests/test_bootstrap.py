@@ -0,0 +1,70 @@
+"""Bootstrap intervals of the material estimates."""
+import numpy as np
+import pytest
+
+from sadgrs import bootstrap, stats
+from sadgrs.aggregate import MATERIAIS, aggregate
+
+CLASSES = [1, 2]
+
+
+def _estatisticas(amostras, rotulos):
+    n, media, m2 = stats.moments(amostras, rotulos, CLASSES)
+    return {
+        'classes': np.array(CLASSES), 'media': media, 'margem': stats.margin(n, m2),
+        'amostras': amostras, 'rotulos': rotulos,
+    }
+
+
+@pytest.fixture
+def estatisticas():
+    rng = np.random.default_rng(0)
+    rotulos = np.repeat(CLASSES, 60)
+    amostras = rng.exponential(100.0 * rotulos[:, None], size=(len(rotulos), len(MATERIAIS)))
+    amostras[rng.random(amostras.shape) < 0.1] = np.nan
+    return _estatisticas(amostras, rotulos)
+
+
+def test_intervals_contain_the_estimate(estatisticas):
+    qntd_clas = [1000, 500]
+    totais = aggregate(qntd_clas, estatisticas['media'], np.zeros((2, 2)))['totais']
+    ic = bootstrap.intervals(qntd_clas, estatisticas, replicates=500)
+    assert (ic['inferior'] < totais).all() and (totais < ic['superior']).all()
+    assert ic['total_inferior'] < np.nansum(totais) < ic['total_superior']
+
+
+def test_same_seed_same_intervals(estatisticas):
+    a = bootstrap.intervals([1000, 500], estatisticas, replicates=300, block_size=64)
+    b = bootstrap.intervals([1000, 500], estatisticas, replicates=300, block_size=64)
+    np.testing.assert_array_equal(a['inferior'], b['inferior'])
+    assert a['total_superior'] == b['total_superior']
+
+
+def test_sparse_material_is_in_every_replicate():
+    # Material 0 measured by a single household of each class: its mean is
+    # the same in every replicate, so the total never drops it
+    rotulos = np.repeat(CLASSES, 30)
+    amostras = np.ones((len(rotulos), len(MATERIAIS)))
+    amostras[:, 0] = np.nan
+    amostras[[0, 30], 0] = 1e6
+    ic = bootstrap.intervals([100, 100], _estatisticas(amostras, rotulos), replicates=500)
+    assert ic['inferior'][0] == pytest.approx(2e8) and ic['superior'][0] == pytest.approx(2e8)
+    assert ic['total_inferior'] >= 2e8
+
+
+def test_material_never_measured_has_no_interval():
+    rotulos = np.repeat(CLASSES, 30)
+    amostras = np.ones((len(rotulos), len(MATERIAIS)))
+    amostras[:, 0] = np.nan
+    ic = bootstrap.intervals([100, 100], _estatisticas(amostras, rotulos), replicates=200)
+    assert np.isnan(ic['inferior'][0]) and np.isnan(ic['superior'][0])
+    assert np.isfinite(ic['inferior'][1:]).all()
+    assert ic['total_inferior'] == pytest.approx(200 * (len(MATERIAIS) - 1))
+
+
+def test_legacy_statistics_use_the_normal_approximation():
+    media = np.full((1, len(MATERIAIS)), 100.0)
+    margem = np.full((1, len(MATERIAIS)), 10.0)
+    ic = bootstrap.intervals([50], {'classes': np.array([1]), 'media': media, 'margem': margem}, replicates=20000)
+    np.testing.assert_allclose(ic['inferior'], 50 * 90.0, rtol=0.01)
+    np.testing.assert_allclose(ic['superior'], 50 * 110.0, rtol=0.01)
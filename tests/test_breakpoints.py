@@ -0,0 +1,49 @@
+"""Breakpoint tables against the model they were compiled from."""
+import pickle
+
+import numpy as np
+
+from sadgrs import breakpoints
+from sadgrs.pipeline import count_classes
+
+
+def test_compile_finds_the_class_changes(model):
+    table = breakpoints.compile_model(model, 100.0, 3000.0, n_samples=1000)
+    np.testing.assert_allclose(table['edges'], model.cortes)
+    assert table['labels'].tolist() == [1, 2, 3]
+
+
+def test_edges_belong_to_the_right_interval(model):
+    table = breakpoints.compile_model(model, 100.0, 3000.0, n_samples=1000)
+    x = np.concatenate([table['edges'], np.nextafter(table['edges'], -np.inf), [100.0, 3000.0]])
+    assert breakpoints.predict_table(table, x).tolist() == model.predict(x).tolist()
+    assert breakpoints.verify(model, table, x) == 1.0
+
+
+def test_values_outside_the_table_use_the_model(model):
+    # Covers only the middle class, so the lowest and highest bands come from the model
+    table = breakpoints.compile_model(model, 700.0, 1400.0, n_samples=100)
+    iptu = np.array([10.0, 650.0, 700.0, 1000.0, 1400.0, 1450.0, 5000.0])
+    counts = count_classes(model, iptu, [1, 2, 3], table=table)
+    assert counts.tolist() == [1, 5, 1]
+
+
+def test_table_counts_match_the_model(model, iptu):
+    esperado = np.bincount(model.predict(iptu), minlength=4)[1:].tolist()
+    table = breakpoints.compile_model(model, 300.0, 2000.0, n_samples=1000)
+    assert count_classes(model, iptu, [1, 2, 3], table=table).tolist() == esperado
+
+
+def test_save_and_load_are_tied_to_the_model_file(model, tmp_path, monkeypatch):
+    from sadgrs.models import registry
+
+    monkeypatch.setattr(registry, 'dir_path', str(tmp_path))
+    monkeypatch.setattr(breakpoints, 'COMPILED_DIR', str(tmp_path / 'compiled'))
+    (tmp_path / 'limiar.sav').write_bytes(pickle.dumps({'versao': 1}))
+    table = breakpoints.compile_model(model, 100.0, 3000.0, n_samples=1000)
+    breakpoints.save('limiar.sav', table, 1.0)
+    np.testing.assert_array_equal(breakpoints.load('limiar.sav')['edges'], table['edges'])
+
+    # A retrained model file must not use the old table
+    (tmp_path / 'limiar.sav').write_bytes(pickle.dumps({'versao': 2, 'retreinado': True}))
+    assert breakpoints.load('limiar.sav') is None
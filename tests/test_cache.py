@@ -0,0 +1,69 @@
+"""Prediction cache: LRU bound in memory and on disk."""
+import os
+import threading
+
+import numpy as np
+
+from sadgrs.cache import PredictionCache, cache_key
+
+
+def _resultado(valor):
+    return {'totais': np.full(3, valor), 'qntd_dom': 10}
+
+
+def _envelhecer(cache, key, segundos):
+    antes = os.path.getmtime(cache._path(key)) - segundos
+    os.utime(cache._path(key), (antes, antes))
+
+
+def test_memory_keeps_the_most_recently_used():
+    cache = PredictionCache(maxsize=2, persist_dir=None)
+    cache.put('a', _resultado(1.0))
+    cache.put('b', _resultado(2.0))
+    cache.get('a')
+    cache.put('c', _resultado(3.0))
+    assert cache.get('b') is None
+    assert cache.get('a')['totais'][0] == 1.0 and cache.get('c')['totais'][0] == 3.0
+
+
+def test_results_are_read_only():
+    cache = PredictionCache(persist_dir=None)
+    resultado = cache.put('a', _resultado(1.0))
+    assert not resultado['totais'].flags.writeable
+
+
+def test_disk_keeps_the_most_recently_used(tmp_path):
+    cache = PredictionCache(maxsize=2, persist_dir=str(tmp_path))
+    cache.put('a', _resultado(1.0))
+    cache.put('b', _resultado(2.0))
+    _envelhecer(cache, 'a', 20)
+    _envelhecer(cache, 'b', 10)
+    # Read from disk, which makes 'a' the most recently used file
+    cache.clear()
+    assert cache.get('a')['totais'][0] == 1.0
+    cache.put('c', _resultado(3.0))
+    assert sorted(os.listdir(tmp_path)) == ['a.npz', 'c.npz']
+
+    # A new process finds what was persisted, but not the pruned result
+    novo = PredictionCache(maxsize=2, persist_dir=str(tmp_path))
+    assert novo.get('c')['totais'][0] == 3.0
+    assert novo.get('b') is None
+
+
+def test_concurrent_puts_of_a_key(tmp_path):
+    cache = PredictionCache(persist_dir=str(tmp_path))
+    grande = {'totais': np.arange(200000, dtype=float)}
+    threads = [threading.Thread(target=cache.put, args=('a', grande)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert os.listdir(tmp_path) == ['a.npz']
+    cache.clear()
+    np.testing.assert_array_equal(cache.get('a')['totais'], grande['totais'])
+
+
+def test_key_depends_on_every_part():
+    assert cache_key('modelo', 1, 'dados') == cache_key('modelo', 1, 'dados')
+    assert cache_key('modelo', 1, 'dados') != cache_key('modelo', 2, 'dados')
+    assert cache_key('ab', 'c') != cache_key('a', 'bc')
@@ -0,0 +1,36 @@
+"""Eviction of the ingested spreadsheets."""
+import os
+import time
+
+import numpy as np
+
+from sadgrs import ingest
+
+
+def _ingerido(monkeypatch, tmp_path, n, idade=0):
+    monkeypatch.setattr(ingest, 'CACHE_DIR', str(tmp_path))
+    pasta = tmp_path / ('%064x' % n)
+    pasta.mkdir()
+    np.save(pasta / 'IPTU.npy', np.arange(3, dtype=np.float32))
+    quando = time.time() - idade
+    os.utime(pasta, (quando, quando))
+    return '%064x' % n
+
+
+def test_least_recently_used_beyond_maxsize_are_removed(monkeypatch, tmp_path):
+    monkeypatch.setattr(ingest, 'INGEST_MAXSIZE', 2)
+    antigos = [_ingerido(monkeypatch, tmp_path, n, idade=100 - n) for n in range(3)]
+    # Reading a file makes it the most recently used
+    ingest.load_column(antigos[0])
+    novo = _ingerido(monkeypatch, tmp_path, 9, idade=1000)
+    ingest._prune(keep=novo)
+    assert sorted(os.listdir(tmp_path)) == sorted([antigos[0], novo])
+
+
+def test_files_unused_for_too_long_are_removed(monkeypatch, tmp_path):
+    monkeypatch.setattr(ingest, 'INGEST_MAX_AGE', 3600)
+    velho = _ingerido(monkeypatch, tmp_path, 1, idade=7200)
+    recente = _ingerido(monkeypatch, tmp_path, 2)
+    (tmp_path / 'predictions').mkdir()
+    ingest._prune(keep=recente)
+    assert sorted(os.listdir(tmp_path)) == sorted(['predictions', recente])
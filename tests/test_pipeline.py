@@ -0,0 +1,67 @@
+"""Class counts of IPTU arrays, deduplicated and in parallel blocks."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from sadgrs import breakpoints
+from sadgrs.pipeline import count_classes, predict_classes
+
+
+def test_counts_match_value_counts_of_every_household(model, iptu):
+    esperado = pd.Series(predict_classes(model, iptu)).value_counts()
+    assert count_classes(model, iptu, [1, 2, 3]).tolist() == [int(esperado.get(c, 0)) for c in (1, 2, 3)]
+
+
+def test_absent_classes_count_zero(model):
+    assert count_classes(model, np.array([10.0, 20.0, 10.0]), [1, 2, 3]).tolist() == [3, 0, 0]
+
+
+def test_class_without_statistics_is_an_error(model):
+    with pytest.raises(ValueError):
+        count_classes(model, np.array([10.0, 2000.0]), [1, 2])
+
+
+def test_decimals_quantize_before_classifying(model):
+    # 599.996 rounds to the cut, which belongs to the second class
+    iptu = np.array([599.996, 599.994, 1000.0])
+    assert count_classes(model, iptu, [1, 2, 3]).tolist() == [2, 1, 0]
+    assert count_classes(model, iptu, [1, 2, 3], decimals=2).tolist() == [1, 2, 0]
+
+
+@pytest.mark.parametrize('block_size, merge_size, chunk_size', [(1000, 300, 64), (1000, 10, 7), (10 ** 6, 10 ** 6, 64)])
+@pytest.mark.parametrize('workers', [1, 4])
+def test_blocks_give_the_counts_of_the_whole_array(model, iptu, block_size, merge_size, chunk_size, workers):
+    esperado = np.bincount(model.predict(iptu), minlength=4)[1:].tolist()
+    table = breakpoints.compile_model(model, 300.0, 2000.0, n_samples=1000)
+    for tabela in (None, table):
+        qntd = count_classes(
+            model, iptu, [1, 2, 3], table=tabela, workers=workers,
+            block_size=block_size, merge_size=merge_size, chunk_size=chunk_size,
+        )
+        assert qntd.tolist() == esperado
+
+
+def test_progress_reaches_the_end(model, iptu):
+    fracoes = []
+    count_classes(model, iptu, [1, 2, 3], block_size=1000, workers=4, progress=fracoes.append)
+    assert fracoes == sorted(fracoes)
+    assert fracoes[-1] == 1.0
+    assert len(fracoes) == -(-len(iptu) // 1000) + 1
+
+
+def test_empty_array(model):
+    assert count_classes(model, np.array([], dtype=np.float32), [1, 2, 3]).tolist() == [0, 0, 0]
+
+
+def test_estimate_key_follows_the_interval_parameters(monkeypatch):
+    from sadgrs import bootstrap, pipeline
+
+    monkeypatch.setattr(pipeline.stats, 'load', lambda name: {'meta': {'versao': 1}})
+    monkeypatch.setattr(pipeline.registry, 'sha256', lambda name: 'abc')
+    chave = pipeline.estimate_key('limiar.sav', 'dados')
+    assert pipeline.estimate_key('limiar.sav', 'dados') == chave
+    assert pipeline.estimate_key('limiar.sav', 'outros') != chave
+    for nome, valor in (('REPLICATES', 10), ('LEVEL', 0.9), ('SEED', 1), ('METHOD', 'outro')):
+        with monkeypatch.context() as m:
+            m.setattr(bootstrap, nome, valor)
+            assert pipeline.estimate_key('limiar.sav', 'dados') != chave
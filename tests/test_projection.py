@@ -0,0 +1,86 @@
+"""Projections of the Visualização page."""
+import numpy as np
+import pytest
+
+from sadgrs import projection
+from sadgrs.aggregate import MATERIAIS, N_RECICLAVEIS
+
+
+@pytest.fixture
+def materiais():
+    # g/day of every material for all households; one material missing
+    valores = np.arange(1.0, len(MATERIAIS) + 1) * 1000000
+    valores[1] = np.nan
+    return valores
+
+
+def test_grid_matches_each_combination(materiais):
+    grid = projection.projection_grid(materiais, qntd_dom=1000, media_pessoa=2.5)
+    for i, tipo in enumerate(projection.TIPOS):
+        for j, dias in enumerate(projection.DIAS):
+            for k, divisor in enumerate(projection.DIVISORES):
+                esperado = materiais * dias / divisor
+                if tipo == 'Por pessoa':
+                    esperado = esperado / (1000 * 2.5)
+                np.testing.assert_allclose(grid['materiais'][i, j, k], esperado)
+
+
+def test_group_totals_leave_missing_materials_out(materiais):
+    totais = projection.projection_grid(materiais, 1000, 2.5)['totais']
+    t = projection.MEDIDAS.index('Grama (g)')
+    reciclaveis, nao_reciclaveis, total = totais[0, 0, t]
+    assert reciclaveis == np.nansum(materiais[:N_RECICLAVEIS])
+    assert nao_reciclaveis == np.nansum(materiais[N_RECICLAVEIS:])
+    assert total == pytest.approx(reciclaveis + nao_reciclaveis)
+
+
+def test_years_without_growth_repeat_the_first_year(materiais):
+    anos = projection.project_years(materiais, [0.0], [0.0], anos=10, densidade=0.5)
+    por_ano = np.nansum(materiais) * 365 / 1000000
+    assert anos['anos'].tolist() == list(range(1, 11))
+    np.testing.assert_allclose(anos['toneladas'][0, 0, :, 2], por_ano)
+    np.testing.assert_allclose(anos['toneladas_acumuladas'][0, 0, :, 2], por_ano * np.arange(1, 11))
+    np.testing.assert_allclose(anos['volume_acumulado'][0, 0, -1, 2], por_ano * 10 / 0.5)
+
+
+def test_growth_follows_population_not_households(materiais):
+    base = np.nansum(materiais) * 365 / 1000000
+    anos = projection.project_years(materiais, [0.02, 0.02], [0.02, 0.0], anos=5)
+    t = np.arange(5)
+    # Same persons per household: generation grows with the households
+    np.testing.assert_allclose(anos['toneladas'][0, 0, :, 2], base * 1.02 ** t)
+    # Fewer persons in more households: the same people generate the same
+    np.testing.assert_allclose(anos['toneladas'][0, 1, :, 2], base)
+
+
+def test_municipalities_and_yearly_density(materiais):
+    dois = np.vstack([materiais, 2 * materiais])
+    taxas = [[0.01, 0.02], [0.0, 0.03]]
+    densidade = np.linspace(0.6, 0.8, 4)
+    anos = projection.project_years(dois, taxas, taxas, anos=4, densidade=densidade)
+    assert anos['toneladas'].shape == (2, 2, 4, len(projection.GRUPOS))
+    for m in range(2):
+        for s in range(2):
+            uma = projection.project_years(dois[m], [taxas[m][s]], [taxas[m][s]], anos=4, densidade=densidade)
+            np.testing.assert_allclose(anos['volume'][m, s], uma['volume'][0, 0])
+    np.testing.assert_allclose(anos['volume'], anos['toneladas'] / densidade[:, None])
+
+
+def test_sweep_matches_the_grid_for_each_slider_value(materiais):
+    superficies = projection.sweep(materiais, qntd_dom=1000)
+    t = projection.MEDIDAS.index('Tonelada (t)')
+    kg = projection.MEDIDAS.index('Quilograma (kg)')
+    for p, pessoas in enumerate(projection.PESSOAS):
+        grid = projection.projection_grid(materiais, 1000, pessoas)['totais']
+        np.testing.assert_allclose(superficies['per_capita'][:, :, p], grid[1, :, kg])
+        for d, densidade in enumerate(projection.DENSIDADES):
+            np.testing.assert_allclose(superficies['volume'][:, :, d], grid[0, :, t] / densidade)
+            np.testing.assert_allclose(
+                superficies['volume_per_capita'][:, :, p, d], grid[1, :, t] / densidade * 1000,
+            )
+
+
+def test_density_index_picks_the_nearest_step():
+    assert projection.DENSIDADES[projection.density_index(0.7)] == 0.7
+    assert projection.DENSIDADES[projection.density_index(0.703)] == 0.7
+    assert projection.density_index(5.0) == len(projection.DENSIDADES) - 1
@@ -0,0 +1,55 @@
+"""Per-session result store and its eviction."""
+import os
+import time
+
+import numpy as np
+
+from sadgrs import results
+from sadgrs.results import ResultStore
+
+
+def _resultado(valor):
+    return {'totais': np.full(3, valor), 'qntd_dom': 10}
+
+
+def test_sessions_are_isolated(tmp_path):
+    store = ResultStore(spill_dir=str(tmp_path))
+    store.put('a', _resultado(1.0))
+    store.put('b', _resultado(2.0))
+    assert store.get('a')['totais'].tolist() == [1.0, 1.0, 1.0]
+    assert store.get('b')['totais'].tolist() == [2.0, 2.0, 2.0]
+    assert store.get('c') is None
+
+
+def test_idle_results_are_spilled_and_reloaded(tmp_path):
+    store = ResultStore(ttl=-1, spill_dir=str(tmp_path))
+    store.put('a', _resultado(1.0))
+    # Expired at once: only the spilled copy is left
+    assert os.listdir(tmp_path) == ['a.npz']
+    store.ttl = 3600
+    assert store.get('a')['totais'].tolist() == [1.0, 1.0, 1.0]
+    assert os.listdir(tmp_path) == []
+
+
+def test_without_spill_dir_idle_results_are_dropped():
+    store = ResultStore(ttl=-1, spill_dir=None)
+    store.put('a', _resultado(1.0))
+    assert store.get('a') is None
+
+
+def test_discard_removes_memory_and_spill(tmp_path):
+    store = ResultStore(ttl=-1, spill_dir=str(tmp_path))
+    store.put('a', _resultado(1.0))
+    store.discard('a')
+    assert store.get('a') is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_old_spills_are_cleaned(tmp_path):
+    velho = tmp_path / 'velho.npz'
+    velho.write_bytes(b'')
+    antes = time.time() - results.SPILL_TTL - 60
+    os.utime(velho, (antes, antes))
+    store = ResultStore(ttl=-1, spill_dir=str(tmp_path))
+    store.put('a', _resultado(1.0))
+    assert os.listdir(tmp_path) == ['a.npz']
@@ -0,0 +1,63 @@
+"""Streaming updates of the class statistics."""
+import numpy as np
+
+from sadgrs import stats
+from sadgrs.aggregate import MATERIAIS
+
+
+def _survey(records, seed):
+    rng = np.random.default_rng(seed)
+    amostras = rng.exponential(100.0, size=(records, len(MATERIAIS)))
+    amostras[rng.random(amostras.shape) < 0.1] = np.nan
+    return amostras, rng.integers(1, 4, size=records)
+
+
+def test_merge_matches_moments_of_all_records():
+    classes = [1, 2, 3]
+    a, rotulos_a = _survey(200, seed=0)
+    b, rotulos_b = _survey(50, seed=1)
+    merged = stats.merge_moments(*stats.moments(a, rotulos_a, classes), *stats.moments(b, rotulos_b, classes))
+    todos = stats.moments(np.vstack([a, b]), np.concatenate([rotulos_a, rotulos_b]), classes)
+    for obtido, esperado in zip(merged, todos):
+        np.testing.assert_allclose(obtido, esperado)
+
+
+def test_merge_with_empty_classes():
+    classes = [1, 2, 3]
+    a, rotulos_a = _survey(100, seed=2)
+    # Only class 3, and one material never measured
+    b, rotulos_b = _survey(30, seed=3)
+    b[:, 0] = np.nan
+    rotulos_b[:] = 3
+    vazio = stats.moments(np.empty((0, len(MATERIAIS))), np.empty(0), classes)
+
+    n, mean, m2 = stats.merge_moments(*vazio, *stats.moments(b, rotulos_b, classes))
+    assert n[:2].sum() == 0 and np.isnan(mean[:2]).all() and (m2[:2] == 0).all()
+    assert n[2, 0] == 0 and np.isnan(mean[2, 0])
+
+    merged = stats.merge_moments(*stats.moments(a, rotulos_a, classes), *stats.moments(b, rotulos_b, classes))
+    todos = stats.moments(np.vstack([a, b]), np.concatenate([rotulos_a, rotulos_b]), classes)
+    for obtido, esperado in zip(merged, todos):
+        np.testing.assert_allclose(obtido, esperado)
+
+
+def test_fold_in_writes_a_new_version(tmp_path, monkeypatch):
+    monkeypatch.setattr(stats, 'STATS_DIR', str(tmp_path))
+    classes = [1, 2, 3]
+    a, rotulos_a = _survey(120, seed=4)
+    b, rotulos_b = _survey(40, seed=5)
+    n, media, m2 = stats.moments(a, rotulos_a, classes)
+    stats.save(
+        'limiar.sav', classes, media, stats.margin(n, m2), np.full((3, 2), 0.5),
+        n=n, m2=m2, n_emb=np.zeros((3, 2)), amostras=a, rotulos=rotulos_a,
+    )
+
+    assert stats.fold_in('limiar.sav', b, None, rotulos_b) == 2
+    novo = stats.load('limiar.sav')
+    n, media, m2 = stats.moments(np.vstack([a, b]), np.concatenate([rotulos_a, rotulos_b]), classes)
+    np.testing.assert_allclose(novo['n'], n)
+    np.testing.assert_allclose(novo['media'], media)
+    np.testing.assert_allclose(novo['margem'], stats.margin(n, m2))
+    assert len(novo['amostras']) == 160
+    # The previous version is kept as it was
+    assert len(stats.load('limiar.sav', version=1)['amostras']) == 120
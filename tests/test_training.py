@@ -0,0 +1,35 @@
+"""Incremental update of the statistics of a trained model."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from sadgrs import stats, training
+from sadgrs.aggregate import MATERIAIS
+
+
+@pytest.fixture
+def gravimetria(tmp_path, monkeypatch):
+    monkeypatch.setattr(stats, 'STATS_DIR', str(tmp_path))
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'IPTU': rng.lognormal(6.7, 0.8, 90), **{m: rng.exponential(50, 90) for m in MATERIAIS}})
+    monkeypatch.setattr(training, 'read_gravimetria', lambda source: df)
+    return df
+
+
+def test_records_are_classified_by_the_training_limits(gravimetria):
+    materiais = gravimetria[MATERIAIS].to_numpy(dtype=float)
+    limites = np.quantile(materiais.sum(axis=1), [1 / 3, 2 / 3])
+    rotulos = np.searchsorted(limites, materiais.sum(axis=1), side='right') + 1
+    artefato = training.class_statistics(materiais, None, rotulos, 3)
+    stats.save('svm.sav', limites=limites, **artefato)
+
+    assert training.update_statistics('svm.sav', b'') == 2
+    novo = stats.load('svm.sav')
+    assert novo['n'][:, 0].tolist() == (2 * np.bincount(rotulos, minlength=4)[1:]).tolist()
+    np.testing.assert_allclose(novo['media'], stats.load('svm.sav', version=1)['media'])
+
+
+def test_legacy_statistics_are_rejected(gravimetria):
+    stats.save('legado.sav', [1, 2, 3], np.ones((3, len(MATERIAIS))), np.ones((3, len(MATERIAIS))), np.ones((3, 2)))
+    with pytest.raises(ValueError):
+        training.update_statistics('legado.sav', b'')